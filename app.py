@@ -1,23 +1,304 @@
 from __future__ import annotations
+import cProfile
 import csv
+import functools
+import gzip
+import hashlib
+import hmac
 import io
-
+import itertools
+import logging
+import mmap
+import os
+import pstats
+import random
+import struct
+import sys
+import threading
+import time
+import tracemalloc
+import types
+import unicodedata
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from urllib.parse import parse_qsl, quote
+
+import argparse
+import asyncio
+import base64
 import json
+from array import array
+from bisect import bisect_left, bisect_right
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import FileResponse
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
+from starlette.routing import Match
 from pydantic import BaseModel
 from fastapi.responses import StreamingResponse
 
+try:
+    import brotli  # optional: enables br-encoded cached exports
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import pyarrow  # optional: Arrow IPC and Parquet exports
+    import pyarrow.compute
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+try:
+    import orjson  # optional: faster encoding of dynamic JSON responses
+except ImportError:  # pragma: no cover
+    orjson = None
+
 
 APP_DIR = Path(__file__).resolve().parent
-DATA_PATH = APP_DIR / "tanzania_all_regions_full_v3.json"
+DATA_PATH = Path(os.environ.get("DATA_PATH", str(APP_DIR / "tanzania_all_regions_full_v3.json")))
 STATIC_DIR = APP_DIR / "static"
+# Prebuilt binary snapshot (see `python app.py build-snapshot`). Used instead
+# of parsing DATA_PATH when present and built from the same JSON.
+SNAPSHOT_PATH = Path(os.environ.get("SNAPSHOT_PATH", str(APP_DIR / "tanzania_locations.snapshot")))
+# Name of the DATA_PATH dataset, which serves requests without `dataset=`.
+DATASET_NAME = os.environ.get("DATASET_NAME", "default")
+# More datasets served side by side, as comma-separated name=path pairs
+# (e.g. "v4=/data/v4.json"). Each one's snapshot, if any, is the path with
+# a .snapshot suffix.
+DATASETS = os.environ.get("DATASETS", "")
+# Poll DATA_PATH/SNAPSHOT_PATH every this many seconds and reload on change
+# (0 disables the watcher; POST /admin/reload still works).
+RELOAD_INTERVAL = float(os.environ.get("RELOAD_INTERVAL", "0"))
+# Token expected in the X-Admin-Token header; admin endpoints are disabled
+# when unset.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+# Export cache budget. Exports larger than EXPORT_CACHE_MAX_ENTRY_BYTES are
+# streamed without being cached.
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get("EXPORT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+EXPORT_CACHE_MAX_ENTRY_BYTES = int(os.environ.get("EXPORT_CACHE_MAX_ENTRY_BYTES", 64 * 1024 * 1024))
+
+# Response cache for listing and search endpoints: total body budget, how
+# long an entry lives, and the max-age advertised to clients and CDNs.
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_MAX_AGE = int(os.environ.get("RESPONSE_CACHE_MAX_AGE", "300"))
+
+# Collect request/search/load metrics and serve them at /metrics. When off,
+# the middleware is not installed and the hooks reduce to a None check.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no", "")
+
+# Request profiling: fraction of requests profiled at random, and how many
+# profiles are kept for GET /admin/profiles. Admins can also ask for a
+# profile with an X-Profile: 1 header or ?profile=1.
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_BUFFER_SIZE = int(os.environ.get("PROFILE_BUFFER_SIZE", "50"))
+PROFILE_TOP = 40
+
+
+# Heavy work (CSV export bodies, wide searches) runs on HEAVY_WORKERS
+# dedicated threads; at most HEAVY_MAX_PENDING more requests may wait for
+# one, and further heavy requests get 503 instead of queueing.
+HEAVY_WORKERS = int(os.environ.get("HEAVY_WORKERS", "2"))
+HEAVY_MAX_PENDING = int(os.environ.get("HEAVY_MAX_PENDING", "8"))
+
+
+# Profiling
+class RequestProfile:
+    """
+    cProfile and tracemalloc data for one profiled request. The profiler is
+    switched on only while the route's own code runs (sync endpoints, and
+    work handed to HEAVY such as each chunk of an export), in whichever
+    thread that happens.
+    """
+
+    def __init__(self) -> None:
+        self.profile = cProfile.Profile()
+        self.started = time.time()
+        self.memory = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        self.allocations: Optional[Dict[str, Any]] = None
+
+    def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        self.profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.profile.disable()
+
+    @types.coroutine
+    def run_coroutine(self, coro: Any) -> Any:
+        """
+        Await coro, profiling only the steps it runs itself: the profiler is
+        switched off while it is suspended, so whatever else the event loop
+        runs in between is not recorded.
+        """
+        value: Any = None
+        error: Optional[BaseException] = None
+        while True:
+            self.profile.enable()
+            try:
+                yielded = coro.send(value) if error is None else coro.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.profile.disable()
+            try:
+                value, error = (yield yielded), None
+            except BaseException as exc:
+                value, error = None, exc
+
+    def measure_memory(self) -> None:
+        """
+        Record the allocation growth since the start; call while tracemalloc
+        is still tracing.
+        """
+        if self.memory is not None and tracemalloc.is_tracing():
+            diff = tracemalloc.take_snapshot().compare_to(self.memory, "lineno")
+            self.allocations = {
+                "allocations": [
+                    {"where": str(d.traceback), "size_kib": round(d.size_diff / 1024, 1), "count": d.count_diff}
+                    for d in diff[:10]
+                ],
+                "traced_peak_kib": round(tracemalloc.get_traced_memory()[1] / 1024, 1),
+            }
+
+    def report(self, top: int) -> Dict[str, Any]:
+        report: Dict[str, Any] = {"functions": [], "stats": ""}
+        # Nothing ran under the profiler (e.g. a 404 or 422 answered before
+        # the endpoint); pstats refuses an empty profile.
+        if self.profile.getstats():
+            out = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=out)
+            stats.sort_stats("cumulative").print_stats(top)
+            functions = sorted(stats.stats.items(), key=lambda kv: -kv[1][3])[:top]
+            report["functions"] = [
+                {"function": pstats.func_std_string(func), "calls": nc, "tottime": round(tt, 6), "cumtime": round(ct, 6)}
+                for func, (_, nc, tt, ct, _) in functions
+            ]
+            report["stats"] = out.getvalue()
+        if self.allocations is not None:
+            report.update(self.allocations)
+        return report
+
+
+ACTIVE_PROFILE: ContextVar[Optional[RequestProfile]] = ContextVar("ACTIVE_PROFILE", default=None)
+PROFILES: "deque[Dict[str, Any]]" = deque(maxlen=PROFILE_BUFFER_SIZE)
+_profile_ids = itertools.count(1)
+_profiles_running = 0
+_profiles_lock = threading.Lock()
+
+
+def profiled(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap a route endpoint so that, when the current request is being
+    profiled, it runs under the request's profiler. Otherwise the cost is
+    one ContextVar lookup.
+    """
+
+    if asyncio.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def run_async(*args: Any, **kwargs: Any) -> Any:
+            profile = ACTIVE_PROFILE.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            return await profile.run_coroutine(endpoint(*args, **kwargs))
+
+        return run_async
+
+    @functools.wraps(endpoint)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        profile = ACTIVE_PROFILE.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        return profile.run(endpoint, *args, **kwargs)
+
+    return run
+
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+class ProfilingMiddleware:
+    """
+    Decides per request whether to profile it: a sampled fraction
+    (PROFILE_SAMPLE_RATE) plus any request asking for it with a valid admin
+    token. Finished profiles go into the PROFILES ring buffer. tracemalloc
+    runs only while at least one profiled request is in flight; it traces
+    the whole process, so allocations of concurrent requests show up too.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    def wanted(self, scope: Any) -> bool:
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            return True
+        if not ADMIN_TOKEN:
+            return False
+        headers = dict(scope["headers"])
+        asked = headers.get(b"x-profile") == b"1" or b"profile=1" in scope.get("query_string", b"").split(b"&")
+        return asked and hmac.compare_digest(headers.get(b"x-admin-token", b""), ADMIN_TOKEN.encode("utf-8"))
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        global _profiles_running
+        if scope["type"] != "http" or not self.wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        with _profiles_lock:
+            _profiles_running += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        profile = RequestProfile()
+        status = 500
+
+        async def observe(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = ACTIVE_PROFILE.set(profile)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, observe)
+        finally:
+            duration = time.perf_counter() - started
+            ACTIVE_PROFILE.reset(token)
+            try:
+                profile.measure_memory()
+            finally:
+                with _profiles_lock:
+                    _profiles_running -= 1
+                    if _profiles_running == 0:
+                        tracemalloc.stop()
+            entry = {
+                "id": next(_profile_ids),
+                "at": profile.started,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "status": status,
+                "duration_ms": round(duration * 1000, 3),
+            }
+            entry.update(profile.report(PROFILE_TOP))
+            PROFILES.append(entry)
+
 
 app = FastAPI()
+app.router.route_class = ProfiledRoute
+if PROFILE_SAMPLE_RATE > 0 or ADMIN_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
+logger = logging.getLogger(__name__)
 
 @app.get("/debug-paths", include_in_schema=False)
 def debug_paths():
@@ -68,514 +349,3379 @@ class SearchHit(BaseModel):
     level: str  # region | district | ward | street
     path: str   # e.g. "Dar es Salaam / Ilala / Buguruni / Malapa"
     name: str
+    score: Optional[float] = None  # fuzzy relevance in [0, 1]; fuzzy mode only
+
+
+class Completions(BaseModel):
+    region: List[SearchHit] = []
+    district: List[SearchHit] = []
+    ward: List[SearchHit] = []
+    street: List[SearchHit] = []
+
+
+class AddressIn(BaseModel):
+    region: Optional[str] = None
+    district: Optional[str] = None
+    ward: Optional[str] = None
+    street: Optional[str] = None
+
+
+class LevelMatch(BaseModel):
+    query: str
+    matched: bool
+    name: Optional[str] = None  # canonical name when matched
+    suggestions: List[str] = []
+
+
+class AddressOut(BaseModel):
+    matched: bool  # every given level matched
+    path: Optional[str] = None  # canonical path of the deepest matched level
+    region: Optional[LevelMatch] = None
+    district: Optional[LevelMatch] = None
+    ward: Optional[LevelMatch] = None
+    street: Optional[LevelMatch] = None
+
+
+class PlaceOut(BaseModel):
+    name: str
+    region: str
+    district: str
+    ward: str
+    street: str
+    path: str
+
 
+class DatasetOut(BaseModel):
+    name: str
+    version: str  # prefix of the source file's SHA-256
+    loaded_at: float
+    default: bool  # served when a request names no dataset
+    regions: int
+    streets: int
+
+
+class StatsOut(BaseModel):
+    level: str  # country | region | district | ward | street
+    path: Optional[str] = None
+    regions: Optional[int] = None
+    districts: Optional[int] = None
+    wards: Optional[int] = None
+    streets: Optional[int] = None
+    places: int
+    postcode: Optional[int] = None  # of the region the node is in
+    streets_with_postcode: int
+    postcode_coverage: float  # share of streets whose region has a postcode
 
 
 # In-memory store + indexes
-DATA: Dict[str, Any] = {}
-_region_index: Dict[str, Dict[str, Any]] = {}
-_district_index: Dict[str, Dict[str, Dict[str, Any]]] = {}
-_ward_index: Dict[str, Dict[str, Dict[str, Dict[str, Any]]]] = {}
-_street_index: Dict[str, Dict[str, Dict[str, Dict[str, Dict[str, Any]]]]] = {}
+LEVELS = ("region", "district", "ward", "street")
+SEARCH_LEVELS = LEVELS
+REGION, DISTRICT, WARD, STREET = range(4)
+# Places are not a Level (they have no children or listings) but are
+# searchable with level=place; PLACE is their level number in search hits.
+PLACE = 4
+
+# Autocomplete: prefixes matching more than COMPLETE_SCAN entries get their
+# best COMPLETE_MAX_K completions precomputed.
+COMPLETE_SCAN = 64
+COMPLETE_MAX_K = 20
+
+# JSON keys a level's children may be under (all are merged) and its name
+# (the first one set wins). Only canonicalize() reads raw JSON.
+CHILD_KEYS = (("DISTRIC", "DISTRICT", "DISTRICTS"), ("WARD", "WARDS"), ("STREETS", "STREET", "ROADS"))
+NAME_KEYS = (("REGION", "name"), ("NAME", "name"), ("NAME", "name"), ("NAME", "name"))
+NO_POSTCODE = -1
+# Place string id of the export row of a street without places.
+NO_PLACE = 0xFFFFFFFF
 
 
 def norm(s: str) -> str:
     return " ".join(s.strip().lower().split())
 
 
-def load_data() -> None:
-    global DATA
-    if not DATA_PATH.exists():
-        raise RuntimeError(f"Missing data file: {DATA_PATH}")
+# Spelling variants folded together for fuzzy matching: "ph" is written "f"
+# in Swahili, and l/r are used interchangeably across dialects and
+# transliterations (e.g. "Kilimanjaro"/"Kirimanjaro").
+FOLD_RULES = (("ph", "f"), ("l", "r"))
 
-    with DATA_PATH.open("r", encoding="utf-8") as f:
-        DATA = json.load(f)
 
-    build_indexes(DATA)
+@functools.lru_cache(maxsize=1 << 16)
+def fold(s: str) -> str:
+    """
+    Spelling-insensitive form of a name for fuzzy matching: accents,
+    spaces and punctuation are dropped, FOLD_RULES applied and repeated
+    letters collapsed, so "Dar-es-Salaam", "Dar es salam" and
+    "daressalaam" all fold to "daresaram".
+    """
+    s = unicodedata.normalize("NFKD", s.lower())
+    s = "".join(c for c in s if c.isalnum())
+    for a, b in FOLD_RULES:
+        s = s.replace(a, b)
+    return "".join(c for i, c in enumerate(s) if i == 0 or c != s[i - 1])
 
 
-def build_indexes(data: Dict[str, Any]) -> None:
-    _region_index.clear()
-    _district_index.clear()
-    _ward_index.clear()
-    _street_index.clear()
+def grams(s: str) -> List[str]:
+    """
+    Distinct bigrams and trigrams of a normalized string.
+    """
+    return list({s[i : i + n] for n in (2, 3) for i in range(len(s) - n + 1)})
 
-    regions = data.get("regions", [])
-    if not isinstance(regions, list):
-        raise RuntimeError("Invalid JSON structure: 'regions' must be a list")
 
-    for r in regions:
-        r_name = r.get("REGION") or r.get("name") or ""
-        r_norm = norm(r_name)
-        if not r_norm:
-            continue
+class StringTable:
+    """
+    Strings packed into one UTF-8 blob and addressed by id.
+    """
 
-        _region_index[r_norm] = r
-        _district_index.setdefault(r_norm, {})
-        _ward_index.setdefault(r_norm, {})
-        _street_index.setdefault(r_norm, {})
+    __slots__ = ("blob", "offsets")
 
-        districts = r.get("DISTRIC", [])
-        if not isinstance(districts, list):
-            continue
+    def __init__(self, blob: Any, offsets: Any) -> None:
+        self.blob = blob
+        self.offsets = offsets
 
-        for d in districts:
-            d_name = d.get("NAME") or d.get("name") or ""
-            d_norm = norm(d_name)
-            if not d_norm:
-                continue
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
 
-            _district_index[r_norm][d_norm] = d
-            _ward_index[r_norm].setdefault(d_norm, {})
-            _street_index[r_norm].setdefault(d_norm, {})
+    def __getitem__(self, i: int) -> str:
+        return str(self.blob[self.offsets[i] : self.offsets[i + 1]], "utf-8")
 
-            wards = d.get("WARD", [])
-            if not isinstance(wards, list):
-                continue
+    def raw(self, i: int) -> Any:
+        """
+        The UTF-8 bytes of string i, without decoding.
+        """
+        return self.blob[self.offsets[i] : self.offsets[i + 1]]
 
-            for w in wards:
-                w_name = w.get("NAME") or w.get("name") or ""
-                w_norm = norm(w_name)
-                if not w_norm:
-                    continue
+    @classmethod
+    def pack(cls, items: Iterable[bytes]) -> "StringTable":
+        """
+        Table of the given encoded strings in order, without interning.
+        """
+        blob = bytearray()
+        offsets = array("I", [0])
+        for item in items:
+            blob += item
+            offsets.append(len(blob))
+        return cls(bytes(blob), offsets)
 
-                _ward_index[r_norm][d_norm][w_norm] = w
-                _street_index[r_norm][d_norm].setdefault(w_norm, {})
+    def sections(self, prefix: str) -> Dict[str, Any]:
+        return {f"{prefix}.blob": self.blob, f"{prefix}.offsets": self.offsets}
 
-                streets = w.get("STREETS", [])
-                if not isinstance(streets, list):
-                    continue
+    @classmethod
+    def from_sections(cls, sec: Dict[str, Any], prefix: str) -> "StringTable":
+        return cls(sec[f"{prefix}.blob"], sec[f"{prefix}.offsets"])
 
-                for s in streets:
-                    s_name = s.get("NAME") or s.get("name") or ""
-                    s_norm = norm(s_name)
-                    if not s_norm:
-                        continue
 
-                    _street_index[r_norm][d_norm][w_norm][s_norm] = s
+class StringPool:
+    """
+    Builder for a StringTable that stores each distinct string once.
+    """
 
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+        self.blob = bytearray()
+        self.offsets = array("I", [0])
 
-@app.on_event("startup")
-def _startup() -> None:
-    load_data()
+    def add(self, s: str) -> int:
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.offsets) - 1
+            self.blob += s.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        return i
 
+    def freeze(self) -> StringTable:
+        return StringTable(bytes(self.blob), self.offsets)
 
 
-# Helpers
-def require_region(region: str) -> Tuple[str, Dict[str, Any]]:
-    r_norm = norm(region)
-    r = _region_index.get(r_norm)
-    if not r:
-        raise HTTPException(status_code=404, detail=f"Region not found: {region}")
-    return r_norm, r
+class GramIndex:
+    """
+    n-gram -> sorted node ids, as a sorted gram table plus one flat posting
+    array.
+    """
 
+    __slots__ = ("grams", "starts", "ids")
+
+    def __init__(self, grams: StringTable, starts: Any, ids: Any) -> None:
+        self.grams = grams
+        self.starts = starts
+        self.ids = ids
+
+    @classmethod
+    def build(cls, keys: Sequence[str]) -> "GramIndex":
+        # Names repeat a lot (streets especially): split each distinct key
+        # once and extend its grams' postings with all its ids.
+        by_key: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            ids = by_key.get(key)
+            if ids is None:
+                by_key[key] = [i]
+            else:
+                ids.append(i)
+        postings: Dict[str, List[int]] = {}
+        for key, ids in by_key.items():
+            for g in grams(key):
+                posting = postings.get(g)
+                if posting is None:
+                    postings[g] = list(ids)
+                else:
+                    posting.extend(ids)
+        pool = StringPool()
+        starts = array("I", [0])
+        flat = array("I")
+        for g in sorted(postings):
+            pool.add(g)
+            flat.extend(sorted(postings[g]))
+            starts.append(len(flat))
+        return cls(pool.freeze(), starts, flat)
+
+    def sections(self, prefix: str) -> Dict[str, Any]:
+        out = self.grams.sections(f"{prefix}.grams")
+        out[f"{prefix}.starts"] = self.starts
+        out[f"{prefix}.ids"] = self.ids
+        return out
+
+    @classmethod
+    def from_sections(cls, sec: Dict[str, Any], prefix: str) -> Optional["GramIndex"]:
+        if f"{prefix}.ids" not in sec:
+            return None
+        return cls(StringTable.from_sections(sec, f"{prefix}.grams"), sec[f"{prefix}.starts"], sec[f"{prefix}.ids"])
+
+    def get(self, gram: str) -> Optional[Sequence[int]]:
+        i = bisect_left(self.grams, gram)
+        if i == len(self.grams) or self.grams[i] != gram:
+            return None
+        return self.ids[self.starts[i] : self.starts[i + 1]]
+
+
+class CompletionView:
+    """
+    Sequence of completion strings (key[node[j]][off[j]:]) for bisect.
+    """
 
-def require_district(r_norm: str, district: str) -> Tuple[str, Dict[str, Any]]:
-    d_norm = norm(district)
-    d = _district_index.get(r_norm, {}).get(d_norm)
-    if not d:
-        raise HTTPException(status_code=404, detail=f"District not found: {district}")
-    return d_norm, d
+    __slots__ = ("keys", "node", "off")
 
+    def __init__(self, keys: Sequence[str], node: Any, off: Any) -> None:
+        self.keys = keys
+        self.node = node
+        self.off = off
 
-def require_ward(r_norm: str, d_norm: str, ward: str) -> Tuple[str, Dict[str, Any]]:
-    w_norm = norm(ward)
-    w = _ward_index.get(r_norm, {}).get(d_norm, {}).get(w_norm)
-    if not w:
-        raise HTTPException(status_code=404, detail=f"Ward not found: {ward}")
-    return w_norm, w
+    def __len__(self) -> int:
+        return len(self.node)
 
+    def __getitem__(self, j: int) -> str:
+        return self.keys[self.node[j]][self.off[j] :]
 
-def paginate(items: List[Any], limit: int, offset: int) -> List[Any]:
-    if offset < 0:
-        offset = 0
-    if limit < 1:
-        limit = 1
-    return items[offset : offset + limit]
+
+def next_prefix(prefix: str) -> str:
+    """
+    Smallest string greater than every string starting with `prefix`.
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
 
 
-def csv_stream(rows: List[List[str]], filename: str) -> StreamingResponse:
+class Completer:
     """
-    Stream CSV without storing a physical file.
+    Prefix completion over one level. Every word start of every key is an
+    entry (node[j], off[j]), sorted by the completion string it starts, so
+    the entries matching a prefix are one bisected range. Nodes are ranked
+    once by weight (order[r] is the node of rank r, rank[i] the rank of
+    node i). Ranges of at most COMPLETE_SCAN entries are scanned; for every
+    longer one the best COMPLETE_MAX_K nodes are precomputed in `top`,
+    keyed by the sorted `prefixes` table.
     """
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-    for row in rows:
-        writer.writerow(row)
 
-    buf.seek(0)
-    headers = {
-        "Content-Disposition": f'attachment; filename="{filename}"'
-    }
-    return StreamingResponse(iter([buf.getvalue()]), media_type="text/csv", headers=headers)
+    __slots__ = ("node", "off", "rank", "order", "prefixes", "top_start", "top")
+
+    def __init__(self, node: Any, off: Any, rank: Any, order: Any, prefixes: StringTable, top_start: Any, top: Any) -> None:
+        self.node = node
+        self.off = off
+        self.rank = rank
+        self.order = order
+        self.prefixes = prefixes
+        self.top_start = top_start
+        self.top = top
+
+    @classmethod
+    def build(cls, keys: Sequence[str], weights: Sequence[int]) -> "Completer":
+        entries = []
+        for i, key in enumerate(keys):
+            entries.append((key, i, 0))
+            for pos, c in enumerate(key):
+                if c == " ":
+                    entries.append((key[pos + 1 :], i, pos + 1))
+        entries.sort()
+        comps = [e[0] for e in entries]
+
+        order = sorted(range(len(keys)), key=lambda i: (-weights[i], len(keys[i]), keys[i]))
+        rank = array("I", bytes(4 * len(keys)))
+        for r, i in enumerate(order):
+            rank[i] = r
+        entry_rank = [rank[e[1]] for e in entries]
+
+        dense: Dict[str, List[int]] = {}
+
+        def best(lo: int, hi: int, prefix: str) -> List[int]:
+            if hi - lo <= COMPLETE_SCAN:
+                return sorted(set(entry_rank[lo:hi]))[:COMPLETE_MAX_K]
+            depth = len(prefix)
+            ranks = set()
+            pos = lo
+            while pos < hi and len(comps[pos]) == depth:
+                ranks.add(entry_rank[pos])
+                pos += 1
+            while pos < hi:
+                child = prefix + comps[pos][depth]
+                end = bisect_left(comps, next_prefix(child), pos, hi)
+                ranks.update(best(pos, end, child))
+                pos = end
+            top = sorted(ranks)[:COMPLETE_MAX_K]
+            dense[prefix] = top
+            return top
+
+        best(0, len(comps), "")
+
+        pool = StringPool()
+        top_start, top = array("I", [0]), array("I")
+        for prefix in sorted(dense):
+            pool.add(prefix)
+            top.extend(order[r] for r in dense[prefix])
+            top_start.append(len(top))
+        return cls(
+            array("I", (e[1] for e in entries)),
+            array("I", (e[2] for e in entries)),
+            rank,
+            array("I", order),
+            pool.freeze(),
+            top_start,
+            top,
+        )
+
+    def sections(self, prefix: str) -> Dict[str, Any]:
+        out = self.prefixes.sections(f"{prefix}.prefixes")
+        for name in ("node", "off", "rank", "order", "top_start", "top"):
+            out[f"{prefix}.{name}"] = getattr(self, name)
+        return out
+
+    @classmethod
+    def from_sections(cls, sec: Dict[str, Any], prefix: str) -> Optional["Completer"]:
+        if f"{prefix}.node" not in sec:
+            return None
+        return cls(
+            sec[f"{prefix}.node"],
+            sec[f"{prefix}.off"],
+            sec[f"{prefix}.rank"],
+            sec[f"{prefix}.order"],
+            StringTable.from_sections(sec, f"{prefix}.prefixes"),
+            sec[f"{prefix}.top_start"],
+            sec[f"{prefix}.top"],
+        )
+
+    def complete(self, keys: Sequence[str], prefix: str, k: int) -> List[int]:
+        """
+        Up to k node ids with a word starting with `prefix`, best first.
+        """
+        view = CompletionView(keys, self.node, self.off)
+        lo = bisect_left(view, prefix)
+        hi = bisect_left(view, next_prefix(prefix), lo)
+        if hi - lo <= COMPLETE_SCAN:
+            ranks = sorted({self.rank[self.node[j]] for j in range(lo, hi)})
+            return [self.order[r] for r in ranks[:k]]
+        i = bisect_left(self.prefixes, prefix)
+        return list(self.top[self.top_start[i] : self.top_start[i + 1]][:k])
+
+
+class Level:
+    """
+    Column store for one level of the hierarchy. Node i has name/key string
+    ids name[i]/key[i] and parent node parent[i]; its children are the
+    next level's nodes child_start[i] .. child_start[i + 1] - 1. Siblings
+    are stored sorted by key, so any subtree is a contiguous id range.
+
+    `search` indexes the keys for substring search; `fold` holds the
+    folded key (see fold()) of every node and `fuzzy` indexes those;
+    `complete` serves prefix completion. `out_json` and `hit_json` are the
+    string ids of every node pre-encoded as its listing model (RegionOut,
+    ...) and as a SearchHit, interned like names so that datasets built
+    into one pool share them. `digest` is a 64-bit hash of every node's
+    subtree, without its own name (see subtree_digests()).
+    """
 
+    __slots__ = (
+        "name", "key", "parent", "child_start", "search", "fold", "fuzzy", "complete", "out_json", "hit_json", "digest"
+    )
+
+    def __init__(
+        self,
+        name: Any,
+        key: Any,
+        parent: Any,
+        child_start: Any,
+        search: Optional[GramIndex] = None,
+        fold: Any = None,
+        fuzzy: Optional[GramIndex] = None,
+        complete: Optional[Completer] = None,
+        out_json: Any = None,
+        hit_json: Any = None,
+        digest: Any = None,
+    ) -> None:
+        self.name = name
+        self.key = key
+        self.parent = parent
+        self.child_start = child_start
+        self.search = search
+        self.fold = fold
+        self.fuzzy = fuzzy
+        self.complete = complete
+        self.out_json = out_json
+        self.hit_json = hit_json
+        self.digest = digest
+
+    def __len__(self) -> int:
+        return len(self.name)
+
+
+class PlaceIndex:
+    """
+    Index over the places of all streets. `key` is the normalized name of
+    every place (by place id, as in HierarchyStore.place_name), `order` the
+    place ids sorted by key for exact lookups, and `search` the n-gram
+    index over the keys for substring search.
+    """
 
-def optional_region(region: Optional[str]) -> Optional[str]:
-    if not region:
-        return None
-    r_norm = norm(region)
-    if r_norm not in _region_index:
-        raise HTTPException(status_code=404, detail=f"Region not found: {region}")
-    return r_norm
+    __slots__ = ("key", "order", "search")
 
+    def __init__(self, key: Any, order: Any, search: Optional[GramIndex]) -> None:
+        self.key = key
+        self.order = order
+        self.search = search
 
-def optional_district(r_norm: str, district: Optional[str]) -> Optional[str]:
-    if not district:
-        return None
-    d_norm = norm(district)
-    if d_norm not in _district_index.get(r_norm, {}):
-        raise HTTPException(status_code=404, detail=f"District not found: {district}")
-    return d_norm
+    def sections(self, prefix: str) -> Dict[str, Any]:
+        sec = {f"{prefix}.key": self.key, f"{prefix}.order": self.order}
+        if self.search is not None:
+            sec.update(self.search.sections(f"{prefix}.search"))
+        return sec
 
+    @classmethod
+    def from_sections(cls, sec: Dict[str, Any], prefix: str) -> Optional["PlaceIndex"]:
+        if f"{prefix}.key" not in sec:
+            return None
+        return cls(sec[f"{prefix}.key"], sec[f"{prefix}.order"], GramIndex.from_sections(sec, f"{prefix}.search"))
 
-def optional_ward(r_norm: str, d_norm: str, ward: Optional[str]) -> Optional[str]:
-    if not ward:
-        return None
-    w_norm = norm(ward)
-    if w_norm not in _ward_index.get(r_norm, {}).get(d_norm, {}):
-        raise HTTPException(status_code=404, detail=f"Ward not found: {ward}")
-    return w_norm
 
+class PlaceKeyView:
+    """
+    Place keys in sorted order, for bisect.
+    """
+
+    __slots__ = ("strings", "key", "order")
 
+    def __init__(self, strings: StringTable, index: PlaceIndex) -> None:
+        self.strings = strings
+        self.key = index.key
+        self.order = index.order
 
+    def __len__(self) -> int:
+        return len(self.order)
 
-# Routes
-@app.get("/health")
-def health() -> Dict[str, Any]:
-    return {
-        "status": "ok",
-        "country": DATA.get("country", "unknown"),
-        "regions": len(DATA.get("regions", [])),
-    }
+    def __getitem__(self, i: int) -> str:
+        return self.strings[self.key[self.order[i]]]
 
 
-@app.get("/regions", response_model=List[RegionOut])
-def list_regions(
-    q: Optional[str] = Query(default=None, description="Filter by region name (contains)."),
-    limit: int = Query(default=50, ge=1, le=500),
-    offset: int = Query(default=0, ge=0),
-) -> List[RegionOut]:
-    regions = DATA.get("regions", [])
-    out: List[RegionOut] = []
+class ExportTable:
+    """
+    The flattened hierarchy in columns, built once for exports. Per street:
+    its region and district ids (the ward is Level.parent). Per export row,
+    one for each place, or one for a street without places: the street id
+    and the place's string id (NO_PLACE if none). Rows follow street order,
+    and streets follow the tree, so the rows below any node are one slice:
+    row_start[lo] .. row_start[hi] for its street range lo .. hi.
+    """
 
-    qn = norm(q) if q else None
+    __slots__ = ("street_region", "street_district", "row_start", "row_street", "row_place")
+
+    def __init__(self, street_region: Any, street_district: Any, row_start: Any, row_street: Any, row_place: Any) -> None:
+        self.street_region = street_region
+        self.street_district = street_district
+        self.row_start = row_start
+        self.row_street = row_street
+        self.row_place = row_place
+
+    @classmethod
+    def build(cls, store: "HierarchyStore") -> "ExportTable":
+        ward_parent = store.levels[WARD].parent
+        district_parent = store.levels[DISTRICT].parent
+        street_region, street_district = array("I"), array("I")
+        row_start, row_street, row_place = array("I", [0]), array("I"), array("I")
+        for si, wi in enumerate(store.levels[STREET].parent):
+            d = ward_parent[wi]
+            street_district.append(d)
+            street_region.append(district_parent[d])
+            lo, hi = store.place_start[si], store.place_start[si + 1]
+            if lo == hi:
+                row_street.append(si)
+                row_place.append(NO_PLACE)
+            else:
+                row_street.extend(itertools.repeat(si, hi - lo))
+                row_place.extend(store.place_name[lo:hi])
+            row_start.append(len(row_street))
+        return cls(street_region, street_district, row_start, row_street, row_place)
+
+    def sections(self, prefix: str) -> Dict[str, Any]:
+        return {f"{prefix}.{name}": getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_sections(cls, sec: Dict[str, Any], prefix: str) -> Optional["ExportTable"]:
+        if f"{prefix}.row_start" not in sec:
+            return None
+        return cls(*(sec[f"{prefix}.{name}"] for name in cls.__slots__))
+
+    def rows(self, streets: range) -> range:
+        return range(self.row_start[streets.start], self.row_start[streets.stop])
+
+
+class KeyView:
+    """
+    Sequence of the normalized keys of one level, for bisect.
+    """
 
-    for r in regions:
-        name = r.get("REGION") or ""
-        if qn and qn not in norm(name):
-            continue
-        out.append(RegionOut(name=name, postcode=r.get("POSTCODE")))
+    __slots__ = ("strings", "key")
+
+    def __init__(self, strings: StringTable, level: Level) -> None:
+        self.strings = strings
+        self.key = level.key
 
-    out.sort(key=lambda x: norm(x.name))
-    return paginate(out, limit, offset)
+    def __len__(self) -> int:
+        return len(self.key)
 
-def pick_list(obj: Dict[str, Any], *keys: str) -> List[Any]:
+    def __getitem__(self, i: int) -> str:
+        return self.strings[self.key[i]]
+
+
+class HierarchyStore:
+    """
+    Flat, array-backed copy of the dataset: one Level per hierarchy level,
+    an interned string table shared by all of them, region postcodes and
+    the places of every street. Datasets loaded together from JSON also
+    share one string table (see load_stores()).
+    """
+
+    __slots__ = (
+        "country", "source", "loaded_at", "strings", "levels", "keys", "postcode", "place_start", "place_name", "table", "place_index",
+        "issues",
+    )
+
+    def __init__(
+        self,
+        country: str,
+        source: str,
+        strings: StringTable,
+        levels: Sequence[Level],
+        postcode: Any,
+        place_start: Any,
+        place_name: Any,
+        table: Optional[ExportTable] = None,
+        place_index: Optional[PlaceIndex] = None,
+    ) -> None:
+        self.country = country
+        self.source = source
+        self.loaded_at = 0.0
+        self.strings = strings
+        self.levels = tuple(levels)
+        self.keys = tuple(KeyView(strings, lv) for lv in self.levels)
+        self.postcode = postcode
+        self.place_start = place_start
+        self.place_name = place_name
+        self.table = table
+        self.place_index = place_index
+        # What canonicalize() reported (stores built from JSON only).
+        self.issues: List[Dict[str, Any]] = []
+
+    def use_strings(self, strings: StringTable) -> None:
+        """
+        Switch to `strings`, a later freeze of the pool this store was built
+        from: every id keeps its string.
+        """
+        self.strings = strings
+        self.keys = tuple(KeyView(strings, lv) for lv in self.levels)
+
+    def name(self, level: int, i: int) -> str:
+        return self.strings[self.levels[level].name[i]]
+
+    def key(self, level: int, i: int) -> str:
+        return self.strings[self.levels[level].key[i]]
+
+    def children(self, level: int, i: int) -> range:
+        """
+        Ids of the children (at level + 1) of node i, in sorted order.
+        """
+        starts = self.levels[level].child_start
+        return range(starts[i], starts[i + 1])
+
+    def descendants(self, level: int, lo: int, hi: int, target: int) -> range:
+        """
+        Ids at `target` level below the nodes lo .. hi - 1 of `level`.
+        """
+        while level < target:
+            starts = self.levels[level].child_start
+            lo, hi = starts[lo], starts[hi]
+            level += 1
+        return range(lo, hi)
+
+    def find(self, level: int, ids: range, key: str) -> Optional[int]:
+        """
+        Id of the node with normalized name `key` among `ids` (a sibling
+        range), by binary search.
+        """
+        keys = self.keys[level]
+        i = bisect_left(keys, key, ids.start, ids.stop)
+        if i < ids.stop and keys[i] == key:
+            return i
+        return None
+
+    def path(self, level: int, i: int) -> str:
+        names = [self.name(level, i)]
+        while level > REGION:
+            i = self.levels[level].parent[i]
+            level -= 1
+            names.append(self.name(level, i))
+        return " / ".join(reversed(names))
+
+    def places(self, street: int) -> List[str]:
+        return [self.strings[self.place_name[j]] for j in range(self.place_start[street], self.place_start[street + 1])]
+
+    def place_street(self, place: int) -> int:
+        """
+        The street a place id belongs to.
+        """
+        return bisect_right(self.place_start, place) - 1
+
+    def place_path(self, place: int) -> str:
+        return self.path(STREET, self.place_street(place)) + " / " + self.strings[self.place_name[place]]
+
+    def find_places(self, key: str) -> List[int]:
+        """
+        Ids of the places whose normalized name is `key`, in street order.
+        """
+        if self.place_index is None:
+            return []
+        keys = PlaceKeyView(self.strings, self.place_index)
+        i = bisect_left(keys, key)
+        found = []
+        while i < len(keys) and keys[i] == key:
+            found.append(self.place_index.order[i])
+            i += 1
+        return found
+
+    def place_count(self, street: int) -> int:
+        return self.place_start[street + 1] - self.place_start[street]
+
+    def region_postcode(self, i: int) -> Optional[int]:
+        pc = self.postcode[i]
+        return None if pc == NO_POSTCODE else pc
+
+
+# Canonicalization
+class Node(NamedTuple):
     """
-    Return the first value that is a list for the given keys.
-    Helps support different JSON structures e.g. DISTRIC vs DISTRICT.
+    One node of the canonical dataset: the only shape build_indexes()
+    reads. Children are sorted by key with duplicates merged; `postcode`
+    is set for regions and `places` for streets.
     """
-    for k in keys:
+
+    name: str
+    key: str
+    fold: str
+    postcode: int = NO_POSTCODE
+    places: Tuple[str, ...] = ()
+    children: Tuple["Node", ...] = ()
+
+
+def node_name(obj: Any, level: int) -> str:
+    for k in NAME_KEYS[level]:
         val = obj.get(k)
+        if val:
+            return str(val)
+    return ""
+
+
+def as_postcode(val: Any) -> int:
+    try:
+        return int(val)
+    except (TypeError, ValueError):
+        return NO_POSTCODE
+
+
+def issue(issues: List[Dict[str, Any]], kind: str, level: int, path: str, detail: str) -> None:
+    issues.append({"kind": kind, "level": LEVELS[level], "path": path, "detail": detail})
+
+
+def canonical_node(raw: Any, level: int, parent_path: str, issues: List[Dict[str, Any]]) -> Optional[Node]:
+    """
+    Validate one raw node and its subtree. Returns None for a node that
+    has to be skipped; everything dropped or merged is added to `issues`.
+    """
+    if not isinstance(raw, dict):
+        issue(issues, "not_an_object", level, parent_path, f"{type(raw).__name__} entry skipped")
+        return None
+    name = node_name(raw, level).strip()
+    key = norm(name)
+    if not key:
+        issue(issues, "unnamed", level, parent_path, "node without a name skipped")
+        return None
+    path = f"{parent_path} / {name}" if parent_path else name
+
+    if level == STREET:
+        places: List[str] = []
+        seen = set()
+        raw_places = raw.get("PLACES", [])
+        if not isinstance(raw_places, list):
+            issue(issues, "not_a_list", level, path, "PLACES is not a list")
+            raw_places = []
+        for p in raw_places:
+            place = str(p).strip() if p is not None else ""
+            place_key = norm(place)
+            if not place_key:
+                issue(issues, "empty_place", level, path, f"place {p!r} skipped")
+            elif place_key in seen:
+                issue(issues, "duplicate_place", level, path, f"place {place!r} listed twice")
+            else:
+                seen.add(place_key)
+                places.append(place)
+        return Node(name, key, fold(key), places=tuple(places))
+
+    postcode = NO_POSTCODE
+    if level == REGION and raw.get("POSTCODE") not in (None, ""):
+        postcode = as_postcode(raw["POSTCODE"])
+        if postcode == NO_POSTCODE:
+            issue(issues, "invalid_postcode", level, path, f"postcode {raw['POSTCODE']!r} ignored")
+
+    raw_children: List[Any] = []
+    used = []
+    for k in CHILD_KEYS[level]:
+        val = raw.get(k)
         if isinstance(val, list):
-            return val
-    return []
+            raw_children.extend(val)
+            used.append(k)
+        elif val is not None:
+            issue(issues, "not_a_list", level, path, f"{k} is not a list")
+    if len(used) > 1:
+        issue(issues, "mixed_keys", level, path, f"children under {', '.join(used)} merged")
+    children = [canonical_node(c, level + 1, path, issues) for c in raw_children]
+    return Node(name, key, fold(key), postcode, children=merge_siblings([c for c in children if c], level + 1, path, issues))
 
 
-@app.get("/regions/{region}/districts", response_model=List[DistrictOut])
-def list_districts(
-    region: str,
-    limit: int = Query(default=100, ge=1, le=2000),
-    offset: int = Query(default=0, ge=0),
-) -> List[DistrictOut]:
-    r_norm, r = require_region(region)
-    districts = pick_list(r, "DISTRIC", "DISTRICT", "DISTRICTS") or []
-    out = [DistrictOut(name=d.get("NAME", "")) for d in districts if d.get("NAME")]
-    out.sort(key=lambda x: norm(x.name))
-    return paginate(out, limit, offset)
+def merge_siblings(nodes: List[Node], level: int, parent_path: str, issues: List[Dict[str, Any]]) -> Tuple[Node, ...]:
+    """
+    Sort siblings by key and merge those with the same key into the first
+    one: children and places are combined, and the first postcode wins.
+    """
+    by_key: Dict[str, List[Node]] = {}
+    for node in nodes:
+        by_key.setdefault(node.key, []).append(node)
+    merged = []
+    for key in sorted(by_key):
+        group = by_key[key]
+        first = group[0]
+        if len(group) > 1:
+            path = f"{parent_path} / {first.name}" if parent_path else first.name
+            names = sorted({n.name for n in group})
+            issue(issues, "duplicate", level, path, f"{len(group)} nodes named {' / '.join(repr(n) for n in names)} merged")
+            postcode = next((n.postcode for n in group if n.postcode != NO_POSTCODE), NO_POSTCODE)
+            postcodes = sorted({n.postcode for n in group if n.postcode != NO_POSTCODE})
+            if len(postcodes) > 1:
+                issue(issues, "conflict", level, path, f"postcodes {postcodes} disagree; kept {postcode}")
+            places = list(first.places)
+            seen = {norm(p) for p in places}
+            for n in group[1:]:
+                for p in n.places:
+                    if norm(p) not in seen:
+                        seen.add(norm(p))
+                        places.append(p)
+            first = first._replace(
+                postcode=postcode,
+                places=tuple(places),
+                children=merge_siblings([c for n in group for c in n.children], level + 1, path, issues),
+            )
+        merged.append(first)
+    return tuple(merged)
+
+
+def canonical_region(raw: Any) -> Tuple[Optional[Node], List[Dict[str, Any]]]:
+    """
+    One region's canonical subtree and issues.
+    """
+    issues: List[Dict[str, Any]] = []
+    return canonical_node(raw, REGION, "", issues), issues
 
 
-@app.get("/regions/{region}/districts/{district}/wards", response_model=List[WardOut])
-def list_wards(
-    region: str,
-    district: str,
-    limit: int = Query(default=200, ge=1, le=2000),
-    offset: int = Query(default=0, ge=0),
-) -> List[WardOut]:
-    r_norm, _ = require_region(region)
-    d_norm, d = require_district(r_norm, district)
-    wards = pick_list(d, "WARD", "WARDS") or []
-    out = [WardOut(name=w.get("NAME", "")) for w in wards if w.get("NAME")]
-    out.sort(key=lambda x: norm(x.name))
-    return paginate(out, limit, offset)
+def canonicalize(data: Any) -> Tuple[str, Tuple[Node, ...], List[Dict[str, Any]]]:
+    """
+    Turn parsed JSON into (country, sorted canonical regions, issues).
+    """
+    regions = data.get("regions", []) if isinstance(data, dict) else None
+    if not isinstance(regions, list):
+        raise RuntimeError("Invalid JSON structure: 'regions' must be a list")
+    results = [canonical_region(r) for r in regions]
+    issues = [i for _, region_issues in results for i in region_issues]
+    merged = merge_siblings([node for node, _ in results if node is not None], REGION, "", issues)
+    return str(data.get("country", "unknown")), merged, issues
 
 
-@app.get("/regions/{region}/districts/{district}/wards/{ward}/streets", response_model=List[StreetOut])
-def list_streets(
-    region: str,
-    district: str,
-    ward: str,
-    limit: int = Query(default=500, ge=1, le=5000),
-    offset: int = Query(default=0, ge=0),
-) -> List[StreetOut]:
-    r_norm, _ = require_region(region)
-    d_norm, _ = require_district(r_norm, district)
-    w_norm, w = require_ward(r_norm, d_norm, ward)
-
-    streets = pick_list(w, "STREETS", "STREET", "ROADS") or []
-    out: List[StreetOut] = []
-    for s in streets:
-        s_name = s.get("NAME") or ""
-        if not s_name:
-            continue
-        places = s.get("PLACES")
-        if not isinstance(places, list):
-            places = []
-        out.append(StreetOut(name=s_name, places=places))
+def issue_summary(issues: List[Dict[str, Any]]) -> str:
+    counts: Dict[str, int] = {}
+    for i in issues:
+        counts[i["kind"]] = counts.get(i["kind"], 0) + 1
+    return ", ".join(f"{n} {kind}" for kind, n in sorted(counts.items()))
 
-    out.sort(key=lambda x: norm(x.name))
-    return paginate(out, limit, offset)
 
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
 
-@app.get("/search", response_model=List[SearchHit])
-def search(
-    q: str = Query(..., min_length=2, description="Search keyword (contains)."),
-    level: str = Query(default="all", description="all | region | district | ward | street"),
-    limit: int = Query(default=50, ge=1, le=200),
-) -> List[SearchHit]:
-    qn = norm(q)
-    hits: List[SearchHit] = []
-
-    if level in ("all", "region"):
-        for r_norm, r in _region_index.items():
-            r_name = r.get("REGION", "")
-            if qn in r_norm:
-                hits.append(SearchHit(level="region", path=r_name, name=r_name))
-
-    if level in ("all", "district"):
-        for r_norm, districts in _district_index.items():
-            r_name = _region_index[r_norm].get("REGION", "")
-            for d_norm, d in districts.items():
-                d_name = d.get("NAME", "")
-                if qn in d_norm:
-                    hits.append(SearchHit(level="district", path=f"{r_name} / {d_name}", name=d_name))
-
-    if level in ("all", "ward"):
-        for r_norm, districts in _ward_index.items():
-            r_name = _region_index[r_norm].get("REGION", "")
-            for d_norm, wards in districts.items():
-                d_name = _district_index[r_norm][d_norm].get("NAME", "")
-                for w_norm, w in wards.items():
-                    w_name = w.get("NAME", "")
-                    if qn in w_norm:
-                        hits.append(SearchHit(level="ward", path=f"{r_name} / {d_name} / {w_name}", name=w_name))
-
-    if level in ("all", "street"):
-        for r_norm, districts in _street_index.items():
-            r_name = _region_index[r_norm].get("REGION", "")
-            for d_norm, wards in districts.items():
-                d_name = _district_index[r_norm][d_norm].get("NAME", "")
-                for w_norm, streets in wards.items():
-                    w_name = _ward_index[r_norm][d_norm][w_norm].get("NAME", "")
-                    for s_norm, s in streets.items():
-                        s_name = s.get("NAME", "")
-                        if qn in s_norm:
-                            hits.append(
-                                SearchHit(
-                                    level="street",
-                                    path=f"{r_name} / {d_name} / {w_name} / {s_name}",
-                                    name=s_name,
-                                )
-                            )
 
-    seen = set()
-    uniq: List[SearchHit] = []
-    for h in hits:
-        key = (h.level, norm(h.path))
-        if key in seen:
+class DatasetSource:
+    """
+    Where one served dataset is loaded from.
+    """
+
+    __slots__ = ("name", "data_path", "snapshot_path")
+
+    def __init__(self, name: str, data_path: Path, snapshot_path: Path) -> None:
+        self.name = name
+        self.data_path = data_path
+        self.snapshot_path = snapshot_path
+
+
+def dataset_sources() -> Dict[str, DatasetSource]:
+    """
+    The configured datasets: DATASET_NAME from DATA_PATH/SNAPSHOT_PATH,
+    then each entry of DATASETS.
+    """
+    sources = {DATASET_NAME: DatasetSource(DATASET_NAME, DATA_PATH, SNAPSHOT_PATH)}
+    for item in DATASETS.split(","):
+        if not item.strip():
             continue
-        seen.add(key)
-        uniq.append(h)
+        name, _, path = (part.strip() for part in item.partition("="))
+        if not name or not path or name in sources:
+            raise RuntimeError(f"Invalid DATASETS entry: {item.strip()!r}")
+        sources[name] = DatasetSource(name, Path(path), Path(path).with_suffix(".snapshot"))
+    return sources
+
+
+def load_json_store(source: DatasetSource, pool: Optional[StringPool] = None) -> HierarchyStore:
+    t0 = time.perf_counter()
+    raw = source.data_path.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    t1 = time.perf_counter()
+    data = json.loads(raw)
+    t2 = time.perf_counter()
+    store = build_indexes(data, source=digest, pool=pool)
+    if store.issues:
+        logger.warning("Dataset %s: %s (run `python app.py validate` for details)", source.name, issue_summary(store.issues))
+    if METRICS is not None:
+        METRICS.load_seconds.update({
+            (source.name, "read"): t1 - t0,
+            (source.name, "parse"): t2 - t1,
+            (source.name, "build_indexes"): time.perf_counter() - t2,
+        })
+    return store
+
+
+def load_snapshot(source: DatasetSource) -> Optional[HierarchyStore]:
+    """
+    The dataset mapped from its snapshot, or None if there is none or it is
+    stale (or unreadable, when the JSON is there to fall back on).
+    """
+    if not source.snapshot_path.exists():
+        return None
+    try:
+        t0 = time.perf_counter()
+        store, meta = read_snapshot(source.snapshot_path)
+        if METRICS is not None:
+            METRICS.load_seconds[source.name, "snapshot"] = time.perf_counter() - t0
+    except SnapshotError as e:
+        if not source.data_path.exists():
+            raise
+        logger.warning("%s; loading JSON instead", e)
+        return None
+    if source.data_path.exists() and not snapshot_is_current(meta, source.data_path):
+        logger.warning("Snapshot %s is stale for %s; loading JSON instead", source.snapshot_path, source.data_path)
+        return None
+    return store
 
-    uniq.sort(key=lambda x: (len(x.path), norm(x.path)))
-    return uniq[:limit]
 
-@app.get("/download/places", include_in_schema=True)
-def download_places(
-    region: Optional[str] = Query(default=None),
-    district: Optional[str] = Query(default=None),
-    ward: Optional[str] = Query(default=None),
-) -> StreamingResponse:
+def load_stores() -> Dict[str, HierarchyStore]:
     """
-    CSV columns: region, district, ward, street, place
+    Load every configured dataset from its snapshot (if current) or JSON,
+    without publishing them. Datasets read from JSON are built into one
+    StringPool, so the names, keys and pre-encoded nodes that versions
+    have in common are stored once. Snapshots are mapped as they are.
     """
-    rows: List[List[str]] = [["region", "district", "ward", "street", "place"]]
+    if METRICS is not None:
+        METRICS.load_seconds.clear()
+    pool = StringPool()
+    stores: Dict[str, HierarchyStore] = {}
+    pooled: List[HierarchyStore] = []
+    for source in dataset_sources().values():
+        store = load_snapshot(source)
+        if store is None:
+            if not source.data_path.exists():
+                raise RuntimeError(f"Missing data file: {source.data_path}")
+            store = load_json_store(source, pool)
+            pooled.append(store)
+        stores[source.name] = store
+    # The last build froze the whole pool; earlier ones only a prefix of it.
+    for store in pooled[:-1]:
+        store.use_strings(pooled[-1].strings)
+    return stores
+
+
+def publish(stores: Dict[str, HierarchyStore]) -> None:
+    """
+    Make `stores` the datasets new requests see. This is a reference swap:
+    requests already running keep using the store they started with.
+    """
+    global STORE, STORES
+    now = time.time()
+    for store in stores.values():
+        store.loaded_at = now
+    STORES = stores
+    STORE = stores[DATASET_NAME]
+    EXPORT_CACHE.clear()
+    RESPONSE_CACHE.clear()
 
-    def add_places(r_name: str, d_name: str, w_name: str, s: Dict[str, Any]) -> None:
-        s_name = s.get("NAME", "")
-        places = s.get("PLACES")
-        if not isinstance(places, list):
-            places = []
-        if not places:
-            rows.append([r_name, d_name, w_name, s_name, ""])
-            return
-        for p in places:
-            rows.append([r_name, d_name, w_name, s_name, str(p)])
 
-    # Export everything if no region
-    if not region:
-        for r_norm, r in _region_index.items():
-            r_name = r.get("REGION", "")
-            for d_norm, d in _district_index.get(r_norm, {}).items():
-                d_name = d.get("NAME", "")
-                for w_norm, w in _ward_index.get(r_norm, {}).get(d_norm, {}).items():
-                    w_name = w.get("NAME", "")
-                    for s_norm, s in _street_index.get(r_norm, {}).get(d_norm, {}).get(w_norm, {}).items():
-                        add_places(r_name, d_name, w_name, s)
-        return csv_stream(rows, "tanzania_places.csv")
-
-    r_norm = optional_region(region)
-    assert r_norm is not None
-    r_name = _region_index[r_norm].get("REGION", "")
+def load_data() -> None:
+    publish(load_stores())
 
-    if not district:
-        for d_norm, d in _district_index.get(r_norm, {}).items():
-            d_name = d.get("NAME", "")
-            for w_norm, w in _ward_index.get(r_norm, {}).get(d_norm, {}).items():
-                w_name = w.get("NAME", "")
-                for s_norm, s in _street_index.get(r_norm, {}).get(d_norm, {}).get(w_norm, {}).items():
-                    add_places(r_name, d_name, w_name, s)
-        safe = norm(region).replace(" ", "_")
-        return csv_stream(rows, f"{safe}_places.csv")
-
-    d_norm = optional_district(r_norm, district)
-    assert d_norm is not None
-    d_name = _district_index[r_norm][d_norm].get("NAME", "")
 
-    if not ward:
-        for w_norm, w in _ward_index.get(r_norm, {}).get(d_norm, {}).items():
-            w_name = w.get("NAME", "")
-            for s_norm, s in _street_index.get(r_norm, {}).get(d_norm, {}).get(w_norm, {}).items():
-                add_places(r_name, d_name, w_name, s)
-        safe = (norm(region) + "_" + norm(district)).replace(" ", "_")
-        return csv_stream(rows, f"{safe}_places.csv")
+class Reloader:
+    """
+    Rebuilds the store in a background thread and publishes it, one reload
+    at a time. Optionally watches the data files for changes.
+    """
+
+    def __init__(self) -> None:
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """
+        Start a reload unless one is already running. Returns True if started.
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self._thread = threading.Thread(target=self._run, name="dataset-reload", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self) -> None:
+        try:
+            publish(load_stores())
+        except Exception as e:
+            logger.exception("Dataset reload failed; keeping version %s", STORE.source[:12])
+            self.last_error = str(e)
+        else:
+            self.reloads += 1
+            self.last_error = None
+
+    @staticmethod
+    def signature() -> Tuple[Tuple[str, int, int], ...]:
+        out = []
+        paths = [path for source in dataset_sources().values() for path in (source.data_path, source.snapshot_path)]
+        for path in paths:
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            out.append((str(path), st.st_mtime_ns, st.st_size))
+        return tuple(out)
 
-    w_norm = optional_ward(r_norm, d_norm, ward)
-    assert w_norm is not None
-    w_name = _ward_index[r_norm][d_norm][w_norm].get("NAME", "")
+    def watch(self, interval: float) -> None:
+        def loop() -> None:
+            seen = self.signature()
+            while not self._stop.wait(interval):
+                current = self.signature()
+                if current != seen:
+                    seen = current
+                    self.start()
 
-    for s_norm, s in _street_index.get(r_norm, {}).get(d_norm, {}).get(w_norm, {}).items():
-        add_places(r_name, d_name, w_name, s)
+        self._stop.clear()
+        self._watcher = threading.Thread(target=loop, name="dataset-watch", daemon=True)
+        self._watcher.start()
 
-    safe = (norm(region) + "_" + norm(district) + "_" + norm(ward)).replace(" ", "_")
-    return csv_stream(rows, f"{safe}_places.csv")
+    def stop(self) -> None:
+        self._stop.set()
 
-@app.get("/download/search", include_in_schema=True)
-def download_search(
-    q: str = Query(..., min_length=2),
-    level: str = Query(default="all"),
-    limit: int = Query(default=200, ge=1, le=2000),
-) -> StreamingResponse:
+
+RELOADER = Reloader()
+
+
+def build_indexes(
+    data: Dict[str, Any],
+    source: str = "",
+    pool: Optional[StringPool] = None,
+) -> HierarchyStore:
     """
-    Same logic as /search, but returns a downloadable CSV.
+    Build a HierarchyStore from the parsed JSON, via canonicalize(). Levels
+    are laid out breadth first with siblings sorted by key. Strings are
+    interned into `pool` if given, which may already hold another
+    dataset's. This takes seconds on a large dataset; snapshots are the
+    fast way to load one.
+    """
+    country, regions, issues = canonicalize(data)
+
+    pool = pool if pool is not None else StringPool()
+    levels: List[Level] = []
+    postcode = array("q")
+    place_start = array("I", [0])
+    place_name = array("I")
+    place_key = array("I")
+    place_keys: List[str] = []
+
+    # (node, parent id) for every node of the current level
+    current: List[Tuple[Node, int]] = [(r, 0) for r in regions]
+    level_folds: List[List[str]] = []
+    level_keys: List[List[str]] = []
+    # "Region / District / ..." of every node, for the pre-encoded hits
+    level_paths: List[List[str]] = []
+    above: List[str] = []
+    for level in range(len(LEVELS)):
+        names, keys, parents, folds = array("I"), array("I"), array("I"), array("I")
+        child_start = array("I", [0])
+        nxt: List[Tuple[Node, int]] = []
+        paths = [node.name if level == REGION else f"{above[parent]} / {node.name}" for node, parent in current]
+
+        for i, (node, parent) in enumerate(current):
+            names.append(pool.add(node.name))
+            keys.append(pool.add(node.key))
+            parents.append(parent)
+            folds.append(pool.add(node.fold))
+            if level == REGION:
+                postcode.append(node.postcode)
+            if level == STREET:
+                for p in node.places:
+                    place_name.append(pool.add(p))
+                    place_keys.append(norm(p))
+                    place_key.append(pool.add(place_keys[-1]))
+                place_start.append(len(place_name))
+                continue
+            nxt.extend((c, i) for c in node.children)
+            child_start.append(len(nxt))
+
+        levels.append(Level(names, keys, parents, child_start, fold=folds))
+        level_folds.append([node.fold for node, _ in current])
+        level_keys.append([node.key for node, _ in current])
+        level_paths.append(paths)
+        current, above = nxt, paths
+
+    strings = pool.freeze()
+    store = HierarchyStore(country, source, strings, levels, postcode, place_start, place_name)
+    store.issues = issues
+    for level, lv in enumerate(store.levels):
+        lv.search = GramIndex.build(level_keys[level])
+        lv.fuzzy = GramIndex.build(level_folds[level])
+        lv.complete = Completer.build(level_keys[level], completion_weights(store, level))
+        lv.out_json = array("I", (pool.add(json_text(out)) for out in listing_items(store, level)))
+        lv.hit_json = array(
+            "I",
+            (
+                pool.add(json_text({"level": LEVELS[level], "path": path, "name": store.name(level, i)}))
+                for i, path in enumerate(level_paths[level])
+            ),
+        )
+    store.use_strings(pool.freeze())
+    subtree_digests(store)
+    store.table = ExportTable.build(store)
+    order = array("I", sorted(range(len(place_keys)), key=place_keys.__getitem__))
+    store.place_index = PlaceIndex(place_key, order, GramIndex.build(place_keys))
+    return store
+
+
+# json.dumps() with these options builds a new encoder on every call.
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def json_text(obj: Any) -> str:
     """
-    hits = search(q=q, level=level, limit=limit)  # reuse your existing function
-    rows = [["level", "name", "path"]]
-    for h in hits:
-        rows.append([h.level, h.name, h.path])
+    Encode `obj` exactly as FastAPI's JSONResponse would.
+    """
+    return _JSON_ENCODER.encode(obj)
 
-    safe = f"search_{norm(q).replace(' ', '_')}.csv"
-    return csv_stream(rows, safe)
 
+def json_fragment(obj: Any) -> bytes:
+    return json_text(obj).encode("utf-8")
 
 
-@app.get("/download/streets", include_in_schema=True)
-def download_streets(
-    region: Optional[str] = Query(default=None),
-    district: Optional[str] = Query(default=None),
-    ward: Optional[str] = Query(default=None),
-) -> StreamingResponse:
+def listing_items(store: HierarchyStore, level: int) -> Iterator[Dict[str, Any]]:
     """
-    CSV columns: region, district, ward, street, places_count
-    Filters are optional:
-      - no filters => exports all streets in Tanzania
-      - region only => exports all streets in that region
-      - region + district => exports all streets in that district
-      - region + district + ward => exports all streets in that ward
+    Every node at `level` as its listing model (RegionOut, DistrictOut,
+    WardOut or StreetOut) would serialize.
     """
-    rows: List[List[str]] = [["region", "district", "ward", "street", "places_count"]]
+    for i in range(len(store.levels[level])):
+        name = store.name(level, i)
+        if level == REGION:
+            yield {"name": name, "postcode": store.region_postcode(i)}
+        elif level == STREET:
+            yield {"name": name, "places": store.places(i)}
+        else:
+            yield {"name": name}
 
-    # If region not provided, export everything
-    if not region:
-        for r_norm, r in _region_index.items():
-            r_name = r.get("REGION", "")
-            for d_norm, d in _district_index.get(r_norm, {}).items():
-                d_name = d.get("NAME", "")
-                for w_norm, w in _ward_index.get(r_norm, {}).get(d_norm, {}).items():
-                    w_name = w.get("NAME", "")
-                    for s_norm, s in _street_index.get(r_norm, {}).get(d_norm, {}).get(w_norm, {}).items():
-                        s_name = s.get("NAME", "")
-                        places = s.get("PLACES")
-                        if not isinstance(places, list):
-                            places = []
-                        rows.append([r_name, d_name, w_name, s_name, str(len(places))])
-
-        return csv_stream(rows, "tanzania_streets.csv")
-
-    # If region provided, validate it
-    r_norm = optional_region(region)
-    assert r_norm is not None
-
-    # If district is provided, validate it. Else export entire region.
-    if not district:
-        r = _region_index[r_norm]
-        r_name = r.get("REGION", "")
-        for d_norm, d in _district_index.get(r_norm, {}).items():
-            d_name = d.get("NAME", "")
-            for w_norm, w in _ward_index.get(r_norm, {}).get(d_norm, {}).items():
-                w_name = w.get("NAME", "")
-                for s_norm, s in _street_index.get(r_norm, {}).get(d_norm, {}).get(w_norm, {}).items():
-                    s_name = s.get("NAME", "")
-                    places = s.get("PLACES")
-                    if not isinstance(places, list):
-                        places = []
-                    rows.append([r_name, d_name, w_name, s_name, str(len(places))])
-
-        safe = norm(region).replace(" ", "_")
-        return csv_stream(rows, f"{safe}_streets.csv")
-
-    d_norm = optional_district(r_norm, district)
-    assert d_norm is not None
-
-    # If ward is provided, validate it. Else export entire district.
-    if not ward:
-        r_name = _region_index[r_norm].get("REGION", "")
-        d_name = _district_index[r_norm][d_norm].get("NAME", "")
-        for w_norm, w in _ward_index.get(r_norm, {}).get(d_norm, {}).items():
-            w_name = w.get("NAME", "")
-            for s_norm, s in _street_index.get(r_norm, {}).get(d_norm, {}).get(w_norm, {}).items():
-                s_name = s.get("NAME", "")
-                places = s.get("PLACES")
-                if not isinstance(places, list):
-                    places = []
-                rows.append([r_name, d_name, w_name, s_name, str(len(places))])
-
-        safe = (norm(region) + "_" + norm(district)).replace(" ", "_")
-        return csv_stream(rows, f"{safe}_streets.csv")
-
-    w_norm = optional_ward(r_norm, d_norm, ward)
-    assert w_norm is not None
-
-    # Export only one ward
-    r_name = _region_index[r_norm].get("REGION", "")
-    d_name = _district_index[r_norm][d_norm].get("NAME", "")
-    w_name = _ward_index[r_norm][d_norm][w_norm].get("NAME", "")
-
-    for s_norm, s in _street_index.get(r_norm, {}).get(d_norm, {}).get(w_norm, {}).items():
-        s_name = s.get("NAME", "")
-        places = s.get("PLACES")
-        if not isinstance(places, list):
-            places = []
-        rows.append([r_name, d_name, w_name, s_name, str(len(places))])
-
-    safe = (norm(region) + "_" + norm(district) + "_" + norm(ward)).replace(" ", "_")
-    return csv_stream(rows, f"{safe}_streets.csv")
+
+def completion_weights(store: HierarchyStore, level: int) -> List[int]:
+    """
+    Autocomplete weight of every node at `level`: its number of children
+    (places, for streets), with a bonus for regions that have a postcode.
+    """
+    if level == STREET:
+        return [store.place_count(i) for i in range(len(store.levels[STREET]))]
+    starts = store.levels[level].child_start
+    weights = [starts[i + 1] - starts[i] for i in range(len(store.levels[level]))]
+    if level == REGION:
+        weights = [w * 2 + (store.postcode[i] != NO_POSTCODE) for i, w in enumerate(weights)]
+    return weights
+
+
+def subtree_digests(store: HierarchyStore) -> None:
+    """
+    Set Level.digest bottom up. A street's digest covers its places (in any
+    order), a region's its postcode, and every other node's the names and
+    digests of its children in order. Equal name and digest mean an equal
+    subtree; equal digest alone marks a rename candidate.
+    """
+    below: Any = None
+    for level in reversed(range(len(LEVELS))):
+        lv = store.levels[level]
+        digests = array("Q")
+        for i in range(len(lv)):
+            h = hashlib.blake2b(digest_size=8)
+            if level == STREET:
+                for place in sorted(store.places(i)):
+                    h.update(place.encode("utf-8") + b"\0")
+            else:
+                if level == REGION:
+                    h.update(b"%d\0" % store.postcode[i])
+                child_names = store.levels[level + 1].name
+                for c in store.children(level, i):
+                    h.update(store.strings.raw(child_names[c]))
+                    h.update(b"\0" + below[c].to_bytes(8, "little"))
+            digests.append(int.from_bytes(h.digest(), "little"))
+        lv.digest = below = digests
+
+
+# Empty until load_data() runs at startup. STORES maps every dataset name
+# to its store; STORE is the DATASET_NAME one.
+STORE = build_indexes({})
+STORES: Dict[str, HierarchyStore] = {DATASET_NAME: STORE}
+
+
+# Binary snapshot: MAGIC, a little header (format version, header length), a
+# JSON header describing each section, then the sections themselves, each
+# 8-byte aligned so they can be used in place from an mmap.
+SNAPSHOT_MAGIC = b"TZLOCSNP"
+SNAPSHOT_VERSION = 8
+_SNAPSHOT_PREFIX = struct.Struct("<8sII")
+
+
+class SnapshotError(RuntimeError):
+    pass
+
+
+def store_sections(store: HierarchyStore) -> Dict[str, Any]:
+    sections: Dict[str, Any] = store.strings.sections("strings")
+    sections["postcode"] = store.postcode
+    sections["place_start"] = store.place_start
+    sections["place_name"] = store.place_name
+    if store.table is not None:
+        sections.update(store.table.sections("table"))
+    if store.place_index is not None:
+        sections.update(store.place_index.sections("place"))
+    for name, lv in zip(LEVELS, store.levels):
+        sections[f"{name}.name"] = lv.name
+        sections[f"{name}.key"] = lv.key
+        sections[f"{name}.parent"] = lv.parent
+        sections[f"{name}.child_start"] = lv.child_start
+        for column in ("fold", "out_json", "hit_json", "digest"):
+            if getattr(lv, column) is not None:
+                sections[f"{name}.{column}"] = getattr(lv, column)
+        parts = (
+            (lv.search, "search"),
+            (lv.fuzzy, "fuzzy"),
+            (lv.complete, "complete"),
+        )
+        for part, prefix in parts:
+            if part is not None:
+                sections.update(part.sections(f"{name}.{prefix}"))
+    return sections
+
+
+def store_from_sections(meta: Dict[str, Any], sec: Dict[str, Any]) -> HierarchyStore:
+    levels = [
+        Level(
+            sec[f"{name}.name"],
+            sec[f"{name}.key"],
+            sec[f"{name}.parent"],
+            sec[f"{name}.child_start"],
+            GramIndex.from_sections(sec, f"{name}.search"),
+            sec.get(f"{name}.fold"),
+            GramIndex.from_sections(sec, f"{name}.fuzzy"),
+            Completer.from_sections(sec, f"{name}.complete"),
+            sec.get(f"{name}.out_json"),
+            sec.get(f"{name}.hit_json"),
+            sec.get(f"{name}.digest"),
+        )
+        for name in LEVELS
+    ]
+    return HierarchyStore(
+        meta["country"],
+        meta["source"],
+        StringTable.from_sections(sec, "strings"),
+        levels,
+        sec["postcode"],
+        sec["place_start"],
+        sec["place_name"],
+        ExportTable.from_sections(sec, "table"),
+        PlaceIndex.from_sections(sec, "place"),
+    )
+
+
+def write_snapshot(store: HierarchyStore, path: Path, source_path: Optional[Path] = None) -> None:
+    """
+    Write `store` to `path` atomically (via a temporary file and rename).
+    """
+    layout: Dict[str, Any] = {}
+    payload: List[Tuple[int, bytes]] = []
+    pos = 0
+    for name, obj in store_sections(store).items():
+        typecode = obj.typecode if isinstance(obj, array) else "B"
+        data = obj.tobytes() if isinstance(obj, array) else bytes(obj)
+        pos = (pos + 7) & ~7
+        layout[name] = [typecode, pos, len(data)]
+        payload.append((pos, data))
+        pos += len(data)
+
+    source_stat = source_path.stat() if source_path is not None else None
+    header = json.dumps({
+        "country": store.country,
+        "source": store.source,
+        "source_size": source_stat.st_size if source_stat else None,
+        "source_mtime_ns": source_stat.st_mtime_ns if source_stat else None,
+        "byteorder": sys.byteorder,
+        "itemsizes": {t: array(t).itemsize for t in "IqQ"},
+        "sections": layout,
+    }).encode("utf-8")
+    base = (_SNAPSHOT_PREFIX.size + len(header) + 7) & ~7
+
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(_SNAPSHOT_PREFIX.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        for off, data in payload:
+            f.seek(base + off)
+            f.write(data)
+        f.truncate(base + pos)
+    os.replace(tmp, path)
+
+
+def read_snapshot(path: Path) -> Tuple[HierarchyStore, Dict[str, Any]]:
+    """
+    Map a snapshot written by write_snapshot() and return the store and
+    the snapshot header. Sections are memoryviews into the shared mapping,
+    so nothing is copied and every worker mapping the same file shares
+    its pages.
+    """
+    with path.open("rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_len = _SNAPSHOT_PREFIX.unpack_from(mm, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format: {path}")
+    meta = json.loads(mm[_SNAPSHOT_PREFIX.size : _SNAPSHOT_PREFIX.size + header_len])
+    if meta["byteorder"] != sys.byteorder or meta["itemsizes"] != {t: array(t).itemsize for t in "IqQ"}:
+        raise SnapshotError(f"Snapshot was built on an incompatible platform: {path}")
+
+    base = (_SNAPSHOT_PREFIX.size + header_len + 7) & ~7
+    view = memoryview(mm)
+    sections = {}
+    for name, (typecode, off, size) in meta["sections"].items():
+        sections[name] = view[base + off : base + off + size].cast(typecode)
+    return store_from_sections(meta, sections), meta
+
+
+def snapshot_is_current(meta: Dict[str, Any], source_path: Path) -> bool:
+    """
+    True if a snapshot with header `meta` was built from `source_path` as it
+    is now. Compares size and mtime first and only hashes the file if they
+    differ.
+    """
+    st = source_path.stat()
+    if meta.get("source_size") == st.st_size and meta.get("source_mtime_ns") == st.st_mtime_ns:
+        return True
+    return file_sha256(source_path) == meta["source"]
+
+
+def search_candidates(store: HierarchyStore, qn: str, level: int) -> Sequence[int]:
+    """
+    Node ids at `level` that may contain `qn`: the posting list of the
+    query's rarest n-gram. Callers still verify with a substring check.
+    """
+    if level == PLACE:
+        index = store.place_index.search if store.place_index is not None else None
+        count = len(store.place_name)
+    else:
+        index = store.levels[level].search
+        count = len(store.levels[level])
+    if len(qn) < 2 or index is None:
+        return range(count)
+    n = 3 if len(qn) >= 3 else 2
+    best: Optional[Sequence[int]] = None
+    for i in range(len(qn) - n + 1):
+        ids = index.get(qn[i : i + n])
+        if ids is None:
+            return ()
+        if best is None or len(ids) < len(best):
+            best = ids
+    return best if best is not None else ()
+
+
+# Fuzzy search bounds: at most FUZZY_SCAN_BUDGET posting entries are read
+# and FUZZY_MAX_CANDIDATES candidates are scored per level.
+FUZZY_SCAN_BUDGET = 50_000
+FUZZY_MAX_CANDIDATES = 5_000
+
+
+def max_edits(n: int) -> int:
+    """
+    Edits tolerated for a folded query of length n.
+    """
+    if n <= 4:
+        return 1
+    if n <= 8:
+        return 2
+    return 3
+
+
+def substring_distance(q: str, text: str) -> int:
+    """
+    Fewest edits turning q into some substring of text, so a misspelt
+    prefix or word of a longer name still matches closely. Uses Myers'
+    bit-parallel form of Sellers' algorithm: one column of the edit matrix
+    per character of text, as bit vectors.
+    """
+    m = len(q)
+    if not m:
+        return 0
+    peq: Dict[str, int] = {}
+    for i, c in enumerate(q):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    best = m
+    for c in text:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        if score < best:
+            best = score
+    return best
+
+
+def fuzzy_candidates(store: HierarchyStore, fq: str, level: int, k: int, within: Optional[range] = None) -> List[int]:
+    """
+    Node ids at `level` (among `within`, if given) that may be within k
+    edits of the folded query, most shared n-grams first. An edit destroys
+    at most n of the query's n-grams, so a match shares at least
+    (grams - n*k) of them: trigrams are used when that bound is positive,
+    else bigrams. Short queries often get no positive bound even from
+    bigrams; one shared bigram is then required, which still finds every
+    match d edits away while (bigrams - 2d) is positive, and a sibling
+    range small enough to score whole is returned as is. The scan stops at
+    FUZZY_SCAN_BUDGET postings; at most FUZZY_MAX_CANDIDATES are returned.
+    """
+    index = store.levels[level].fuzzy
+    if index is None:
+        return []
+    for n in (3, 2):
+        query_grams = {fq[i : i + n] for i in range(len(fq) - n + 1)}
+        if len(query_grams) - n * k > 0:
+            break
+    else:
+        space = within if within is not None else range(len(store.levels[level]))
+        if len(space) <= FUZZY_MAX_CANDIDATES:
+            return list(space)
+    postings = [index.get(g) or () for g in query_grams]
+    if within is not None:
+        # Posting lists are sorted, so a sibling range is one slice of each.
+        postings = [ids[bisect_left(ids, within.start) : bisect_left(ids, within.stop)] for ids in postings]
+    postings.sort(key=len)
+
+    counts: Dict[int, int] = {}
+    scanned = budget = 0
+    for ids in postings:
+        if budget + len(ids) > FUZZY_SCAN_BUDGET:
+            if scanned:
+                break
+            ids = ids[:FUZZY_SCAN_BUDGET]
+        scanned += 1
+        budget += len(ids)
+        for i in ids:
+            counts[i] = counts.get(i, 0) + 1
+
+    need = max(1, scanned - n * k)
+    found = [i for i, c in counts.items() if c >= need]
+    if len(found) > FUZZY_MAX_CANDIDATES:
+        found.sort(key=lambda i: -counts[i])
+        del found[FUZZY_MAX_CANDIDATES:]
+    return found
+
+
+def fuzzy_score(fq: str, target: str, dist: int) -> float:
+    """
+    Relevance in [0, 1]: mostly how few edits were needed, partly how much
+    of the name the query covers (so "Ilala" ranks the ward "Ilala" above
+    "Ilala Kota").
+    """
+    similarity = 1 - dist / len(fq)
+    coverage = min(len(fq), len(target)) / max(len(fq), len(target))
+    return round(0.7 * similarity + 0.3 * coverage, 4)
+
+
+def fuzzy_search(store: HierarchyStore, q: str, level: str, limit: int) -> List[Tuple[int, int, Optional[float]]]:
+    fq = fold(q)
+    k = max_edits(len(fq))
+    seen = set()
+    matches: List[Tuple[float, int, str, int, int]] = []
+
+    for lvl, lvl_name in enumerate(SEARCH_LEVELS):
+        if level not in ("all", lvl_name):
+            continue
+        folds = store.levels[lvl].fold
+        candidates = fuzzy_candidates(store, fq, lvl, k)
+        if METRICS is not None:
+            METRICS.candidates.observe(len(candidates), ("fuzzy", lvl_name))
+        for i in candidates:
+            target = store.strings[folds[i]]
+            dist = substring_distance(fq, target)
+            if dist > k:
+                continue
+            path = store.path(lvl, i)
+            path_norm = norm(path)
+            if (lvl, path_norm) in seen:
+                continue
+            seen.add((lvl, path_norm))
+            matches.append((-fuzzy_score(fq, target, dist), len(path), path_norm, lvl, i))
+
+    matches.sort(key=lambda m: (m[0], m[1], m[2]))
+    return [(lvl, i, -neg_score) for neg_score, _, _, lvl, i in matches[:limit]]
+
+
+def find_hits(store: HierarchyStore, q: str, level: str, limit: int, fuzzy: bool) -> List[Tuple[int, int, Optional[float]]]:
+    """
+    The /search result as (level, node, score) triples, best first. Exact
+    matches are ordered by shortest path and carry no score.
+    """
+    if fuzzy and len(fold(q)) >= 3 and level != "place":
+        return fuzzy_search(store, q, level, limit)
+
+    qn = norm(q)
+    seen = set()
+    matches: List[Tuple[int, str, int, int]] = []
+
+    for lvl in search_levels(level):
+        lvl_name = hit_level(lvl)
+        candidates = search_candidates(store, qn, lvl)
+        if METRICS is not None:
+            METRICS.candidates.observe(len(candidates), ("exact", lvl_name))
+        for i in candidates:
+            if qn not in hit_key(store, lvl, i):
+                continue
+            path = hit_path(store, lvl, i)
+            path_norm = norm(path)
+            if (lvl, path_norm) in seen:
+                continue
+            seen.add((lvl, path_norm))
+            matches.append((len(path), path_norm, lvl, i))
+
+    matches.sort(key=lambda m: (m[0], m[1]))
+    return [(lvl, i, None) for _, _, lvl, i in matches[:limit]]
+
+
+def search_levels(level: str) -> List[int]:
+    """
+    Level numbers an exact search covers: every hierarchy level for "all",
+    or the one named (places only when asked for with "place").
+    """
+    if level == "place":
+        return [PLACE]
+    return [lvl for lvl, name in enumerate(SEARCH_LEVELS) if level in ("all", name)]
+
+
+def hit_level(lvl: int) -> str:
+    return "place" if lvl == PLACE else LEVELS[lvl]
+
+
+def hit_key(store: HierarchyStore, lvl: int, i: int) -> str:
+    if lvl == PLACE:
+        return store.strings[store.place_index.key[i]]
+    return store.key(lvl, i)
+
+
+def hit_name(store: HierarchyStore, lvl: int, i: int) -> str:
+    if lvl == PLACE:
+        return store.strings[store.place_name[i]]
+    return store.name(lvl, i)
+
+
+def hit_path(store: HierarchyStore, lvl: int, i: int) -> str:
+    if lvl == PLACE:
+        return store.place_path(i)
+    return store.path(lvl, i)
+
+
+# Batch resolution limits: items per JSON request, bytes per NDJSON line,
+# suggestions per missed level, siblings scanned directly for suggestions
+# (larger sibling sets go through the fuzzy index), and lookups memoized
+# per request.
+RESOLVE_MAX_ITEMS = 10_000
+RESOLVE_MAX_LINE_BYTES = 16 * 1024
+RESOLVE_SUGGESTIONS = 3
+RESOLVE_SCAN = 500
+RESOLVE_MEMO_SIZE = 100_000
+
+
+class Resolver:
+    """
+    Resolves partial addresses against one store. Every (level, parent,
+    name) lookup is memoized, so a batch where many rows share a region or
+    district pays for each distinct prefix once.
+    """
+
+    def __init__(self, store: HierarchyStore) -> None:
+        self.store = store
+        self._memo: Dict[Tuple[int, int, str], Tuple[Optional[int], List[str]]] = {}
+
+    def lookup(self, level: int, parent: int, query: str) -> Tuple[Optional[int], List[str]]:
+        """
+        (node id, []) if `query` names a child of `parent`, else
+        (None, suggestions).
+        """
+        key = (level, parent, norm(query))
+        hit = self._memo.get(key)
+        if hit is None:
+            store = self.store
+            ids = range(len(store.levels[REGION])) if level == REGION else store.children(level - 1, parent)
+            i = store.find(level, ids, key[2])
+            hit = (i, []) if i is not None else (None, self.suggest(level, ids, query))
+            if len(self._memo) >= RESOLVE_MEMO_SIZE:
+                self._memo.clear()
+            self._memo[key] = hit
+        return hit
+
+    def suggest(self, level: int, ids: range, query: str) -> List[str]:
+        store = self.store
+        fq = fold(query)
+        if not fq:
+            return []
+        k = max_edits(len(fq))
+        if len(ids) <= RESOLVE_SCAN:
+            candidates: Iterable[int] = ids
+        else:
+            candidates = fuzzy_candidates(store, fq, level, k, ids)
+        folds = store.levels[level].fold
+        scored = []
+        for i in candidates:
+            target = store.strings[folds[i]]
+            dist = substring_distance(fq, target)
+            if dist <= k:
+                scored.append((-fuzzy_score(fq, target, dist), store.key(level, i), i))
+        scored.sort()
+        return [store.name(level, i) for _, _, i in scored[:RESOLVE_SUGGESTIONS]]
+
+    def resolve(self, addr: AddressIn) -> AddressOut:
+        store = self.store
+        out = AddressOut(matched=True)
+        parent: Optional[int] = 0
+        deepest: Optional[Tuple[int, int]] = None
+        for level, lvl_name in enumerate(LEVELS):
+            query = getattr(addr, lvl_name)
+            if not query:
+                # Lower levels can't be placed without this one.
+                parent = None
+                continue
+            if parent is None:
+                setattr(out, lvl_name, LevelMatch(query=query, matched=False))
+                out.matched = False
+                continue
+            i, suggestions = self.lookup(level, parent, query)
+            if i is None:
+                setattr(out, lvl_name, LevelMatch(query=query, matched=False, suggestions=suggestions))
+                out.matched = False
+                parent = None
+                continue
+            setattr(out, lvl_name, LevelMatch(query=query, matched=True, name=store.name(level, i)))
+            deepest = (level, i)
+            parent = i
+        if deepest is not None:
+            out.path = store.path(*deepest)
+        return out
+
+
+@app.on_event("startup")
+def _startup() -> None:
+    started = time.perf_counter()
+    load_data()
+    if METRICS is not None:
+        METRICS.startup_seconds = time.perf_counter() - started
+    if RELOAD_INTERVAL > 0:
+        RELOADER.watch(RELOAD_INTERVAL)
+
+
+@app.on_event("shutdown")
+def _shutdown() -> None:
+    RELOADER.stop()
+
+
+
+# Metrics
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CANDIDATE_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def prom_escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prom_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def prom_labels(names: Sequence[str], values: Sequence[Any], le: Optional[str] = None) -> str:
+    pairs = [f'{n}="{prom_escape(v)}"' for n, v in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[Any, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[Any, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{prom_labels(self.labels, labels)} {prom_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram per label set, rendered in the Prometheus
+    text format.
+    """
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self.series: Dict[Tuple[Any, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Tuple[Any, ...] = ()) -> None:
+        # series layout: one count per bucket, then +Inf count, then sum
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0.0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self.series.items())
+        for labels, series in items:
+            total = 0.0
+            for bound, n in zip(self.buckets + (float("inf"),), series):
+                total += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{prom_labels(self.labels, labels, le)} {prom_value(total)}")
+            lines.append(f"{self.name}_sum{prom_labels(self.labels, labels)} {prom_value(series[-1])}")
+            lines.append(f"{self.name}_count{prom_labels(self.labels, labels)} {prom_value(total)}")
+        return lines
+
+
+class Metrics:
+    """
+    Process-wide metrics. Request latency and response bytes are recorded
+    by MetricsMiddleware; search candidate counts and load timings by hooks
+    in the search and load code. Dataset and cache sizes are read from the
+    live objects at scrape time.
+    """
+
+    def __init__(self) -> None:
+        self.latency = Histogram(
+            "tanzania_http_request_duration_seconds", "Request latency by route.", LATENCY_BUCKETS, ("method", "route", "status")
+        )
+        self.response_bytes = Counter(
+            "tanzania_http_response_bytes_total", "Response body bytes sent, by route (includes /download/* streams).", ("route",)
+        )
+        self.candidates = Histogram(
+            "tanzania_search_candidates", "Nodes verified per search and level.", CANDIDATE_BUCKETS, ("mode", "level")
+        )
+        self.load_seconds: Dict[Tuple[str, str], float] = {}
+        self.startup_seconds = 0.0
+
+    def render(self) -> str:
+        stores = sorted(STORES.items())
+        lines = self.latency.render() + self.response_bytes.render() + self.candidates.render()
+
+        def family(name: str, help: str, samples: Iterable[Tuple[str, float]], kind: str = "gauge") -> None:
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}"])
+            lines.extend(f"{name}{labels} {prom_value(value)}" for labels, value in samples)
+
+        family("tanzania_load_seconds", "Duration of each stage of the last dataset load.",
+              ((prom_labels(("dataset", "stage"), key), v) for key, v in sorted(self.load_seconds.items())))
+        family("tanzania_startup_seconds", "Time from startup to the first dataset being served.", [("", self.startup_seconds)])
+        family("tanzania_dataset_loaded_timestamp_seconds", "When each dataset was published.",
+              [(prom_labels(("dataset",), (name,)), store.loaded_at) for name, store in stores])
+        family("tanzania_reloads_total", "Completed background reloads.", [("", RELOADER.reloads)], "counter")
+
+        nodes, grams, postings, fuzzy_grams, completions, places, strings = [], [], [], [], [], [], []
+        for name, store in stores:
+            for lvl, lv in enumerate(store.levels):
+                label = prom_labels(("dataset", "level"), (name, LEVELS[lvl]))
+                nodes.append((label, len(lv)))
+                if lv.search is not None:
+                    grams.append((label, len(lv.search.grams)))
+                    postings.append((label, len(lv.search.ids)))
+                if lv.fuzzy is not None:
+                    fuzzy_grams.append((label, len(lv.fuzzy.grams)))
+                if lv.complete is not None:
+                    completions.append((label, len(lv.complete.node)))
+            label = prom_labels(("dataset",), (name,))
+            places.append((label, len(store.place_name)))
+            strings.append((label, len(store.strings)))
+        family("tanzania_index_nodes", "Nodes per level.", nodes)
+        family("tanzania_index_search_grams", "Distinct n-grams in the substring index per level.", grams)
+        family("tanzania_index_search_postings", "Posting entries in the substring index per level.", postings)
+        family("tanzania_index_fuzzy_grams", "Distinct trigrams in the fuzzy index per level.", fuzzy_grams)
+        family("tanzania_index_completion_entries", "Word-start entries in the completion index per level.", completions)
+        family("tanzania_index_places", "Places across all streets.", places)
+        family("tanzania_index_strings", "Interned strings (shared by datasets built together).", strings)
+
+        family("tanzania_heavy_inflight", "Heavy tasks running or waiting for a worker.", [("", HEAVY.inflight)])
+        family("tanzania_heavy_rejected_total", "Heavy requests refused with 503.", [("", HEAVY.rejected)], "counter")
+        caches = [(prom_labels(("cache",), (name,)), cache) for name, cache in (("response", RESPONSE_CACHE), ("export", EXPORT_CACHE))]
+        family("tanzania_cache_hits_total", "Cache lookups that found an entry.", [(l, c.hits) for l, c in caches], "counter")
+        family("tanzania_cache_misses_total", "Cache lookups that found nothing.", [(l, c.misses) for l, c in caches], "counter")
+        family("tanzania_cache_bytes", "Bytes held by the cache.", [(l, c.bytes) for l, c in caches])
+        family("tanzania_cache_entries", "Entries held by the cache.", [(l, len(c)) for l, c in caches])
+        return "\n".join(lines) + "\n"
+
+
+METRICS: Optional[Metrics] = Metrics() if METRICS_ENABLED else None
+
+
+class MetricsMiddleware:
+    """
+    Records latency and response bytes of every HTTP request, labelled by
+    route template (not the raw path, to keep label cardinality bounded).
+    """
+
+    def __init__(self, app: Any, metrics: Metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        sent = 0
+
+        async def observe(message: Dict[str, Any]) -> None:
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, observe)
+        finally:
+            route = route_label(scope)
+            self.metrics.latency.observe(time.perf_counter() - started, (scope["method"], route, status))
+            self.metrics.response_bytes.inc((route,), sent)
+
+
+def route_label(scope: Any) -> str:
+    """
+    Path template of the route that handled (or would handle) the request.
+    Responses served by the response cache never reach the router, so the
+    route is matched here for those.
+    """
+    route = scope.get("route")
+    if route is None:
+        for candidate in app.router.routes:
+            if candidate.matches(scope)[0] == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", "other") if route is not None else "other"
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    if METRICS is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Helpers
+def require_region(store: HierarchyStore, region: str) -> int:
+    r = store.find(REGION, range(len(store.levels[REGION])), norm(region))
+    if r is None:
+        raise HTTPException(status_code=404, detail=f"Region not found: {region}")
+    return r
+
+
+def require_district(store: HierarchyStore, r: int, district: str) -> int:
+    d = store.find(DISTRICT, store.children(REGION, r), norm(district))
+    if d is None:
+        raise HTTPException(status_code=404, detail=f"District not found: {district}")
+    return d
+
+
+def require_ward(store: HierarchyStore, d: int, ward: str) -> int:
+    w = store.find(WARD, store.children(DISTRICT, d), norm(ward))
+    if w is None:
+        raise HTTPException(status_code=404, detail=f"Ward not found: {ward}")
+    return w
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response for routes that assemble their body from pre-encoded
+    fragments. Bytes are sent as-is; anything else is encoded with orjson
+    when it is installed. Routes keep their response_model so the OpenAPI
+    schema is unchanged.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json_fragment(content)
+
+
+def json_array(fragments: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(fragments) + b"]"
+
+
+def hit_fragment(store: HierarchyStore, level: int, i: int, score: Optional[float]) -> bytes:
+    if level == PLACE:
+        return json_fragment({"level": "place", "path": store.place_path(i), "name": hit_name(store, PLACE, i)})
+    frag = store.strings.raw(store.levels[level].hit_json[i])
+    if score is None:
+        return frag
+    return b"".join((frag[:-1], b',"score":', json_fragment(score), b"}"))
+
+
+def listing_response(store: HierarchyStore, level: int, ids: Iterable[int]) -> FastJSONResponse:
+    raw, out_json = store.strings.raw, store.levels[level].out_json
+    return FastJSONResponse(json_array(raw(out_json[i]) for i in ids))
+
+
+def encode_cursor(store: HierarchyStore, level: int, ids: range, i: int) -> str:
+    """
+    Opaque token for the page starting at node i of the sibling range
+    `ids`: the dataset version, the sort key of the last node already
+    returned and its ordinal among siblings sharing that key, plus i itself
+    as a position hint for the same version.
+    """
+    keys = store.keys[level]
+    key = keys[i - 1]
+    dup = i - 1 - bisect_left(keys, key, ids.start, i - 1)
+    token = json_fragment({"v": store.source[:16], "k": key, "n": dup, "i": i})
+    return base64.urlsafe_b64encode(token).decode("ascii").rstrip("=")
+
+
+def decode_cursor(store: HierarchyStore, level: int, ids: range, cursor: str) -> int:
+    """
+    Position in `ids` at which the page for `cursor` starts. With the same
+    dataset version the hint is used as is; after a reload the position is
+    found again by binary search on the sort key, so no row is skipped or
+    repeated unless it was itself added or removed.
+    """
+    try:
+        token = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        version, key, dup, hint = str(token["v"]), str(token["k"]), int(token["n"]), int(token["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    keys = store.keys[level]
+    if dup < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if version == store.source[:16]:
+        # Same data: the hint must point into this sibling range, after
+        # the node it names. Anything else came from another listing.
+        if not (ids.start < hint <= ids.stop and keys[hint - 1] == key):
+            raise HTTPException(status_code=400, detail="Cursor does not belong to this listing")
+        return hint
+    lo = bisect_left(keys, key, ids.start, ids.stop)
+    return max(ids.start, min(lo + dup + 1, bisect_right(keys, key, lo, ids.stop), ids.stop))
+
+
+def cursor_page(
+    request: Request,
+    store: HierarchyStore,
+    level: int,
+    ids: range,
+    limit: int,
+    offset: int,
+    cursor: Optional[str],
+) -> FastJSONResponse:
+    """
+    One page of the sibling range `ids`, starting at `cursor` if given
+    (offset is then ignored) and at `offset` otherwise. When more rows
+    follow, the token for the next page is sent in X-Next-Cursor and as a
+    Link rel="next" URL.
+    """
+    start = decode_cursor(store, level, ids, cursor) if cursor else min(ids.start + offset, ids.stop)
+    stop = min(start + limit, ids.stop)
+    response = listing_response(store, level, range(start, stop))
+    if stop < ids.stop:
+        token = encode_cursor(store, level, ids, stop)
+        url = request.url.replace(path=quote(request.url.path))
+        url = url.remove_query_params("offset").include_query_params(cursor=token)
+        response.headers["X-Next-Cursor"] = token
+        response.headers["Link"] = f'<{url}>; rel="next"'
+    return response
+
+
+def paginate(items: Sequence[Any], limit: int, offset: int) -> Sequence[Any]:
+    if offset < 0:
+        offset = 0
+    if limit < 1:
+        limit = 1
+    return items[offset : offset + limit]
+
+
+class HeavyExecutor:
+    """
+    Dedicated, bounded executor for CPU-heavy work, so that exports and
+    wide searches neither take threads from the default pool nor queue
+    without limit. Admission is decided up front: when `workers` tasks are
+    running and `max_pending` more are waiting, new heavy requests are
+    refused with 503 and Retry-After. Cheap routes never come here.
+    """
+
+    def __init__(self, workers: int, max_pending: int) -> None:
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="heavy")
+        self.limit = workers + max_pending
+        self.inflight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def admit(self) -> None:
+        with self._lock:
+            if self.inflight >= self.limit:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="Server busy, retry shortly", headers={"Retry-After": "1"})
+            self.inflight += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self.inflight -= 1
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> "Future[Any]":
+        # Carry the request's context (e.g. ACTIVE_PROFILE) into the worker.
+        profile = ACTIVE_PROFILE.get()
+        call = functools.partial(profile.run, fn, *args) if profile is not None else functools.partial(fn, *args)
+        return self.pool.submit(copy_context().run, call)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self.admit()
+        try:
+            return await asyncio.wrap_future(self.submit(fn, *args))
+        finally:
+            self.release()
+
+    def stream(self, iterator: Iterator[Any]) -> "HeavyStream":
+        """
+        Admit a streamed response body now (so a refusal is still a clean
+        503); its chunks are produced on the pool. Serve it with
+        HeavyStreamingResponse, which gives the slot back.
+        """
+        self.admit()
+        return HeavyStream(self, iterator)
+
+
+class HeavyStream:
+    """
+    Body of a streamed response whose chunks come from a sync iterator run
+    on a HeavyExecutor. It holds an admission slot until close(), which also
+    closes the iterator once no worker is inside it any more.
+    """
+
+    def __init__(self, executor: HeavyExecutor, iterator: Iterator[Any]) -> None:
+        self.executor = executor
+        self.iterator = iterator
+        self.pending: Optional["Future[Any]"] = None
+        self.closed = False
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self.chunks()
+
+    async def chunks(self) -> AsyncIterator[Any]:
+        done = object()
+        while not self.closed:
+            self.pending = self.executor.submit(next, self.iterator, done)
+            chunk = await asyncio.wrap_future(self.pending)
+            self.pending = None
+            if chunk is done:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.executor.release()
+        close = getattr(self.iterator, "close", None)
+        if close is None:
+            return
+        if self.pending is None:
+            close()
+        else:
+            # A worker may still be running next(); close after it returns.
+            self.pending.add_done_callback(lambda _: close())
+
+
+class HeavyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for a HEAVY.stream() body. The body is closed however
+    the response ends, including when the client goes away before the first
+    chunk and the body iterator never starts.
+    """
+
+    body_iterator: HeavyStream
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.body_iterator.close()
+
+
+HEAVY = HeavyExecutor(HEAVY_WORKERS, HEAVY_MAX_PENDING)
+
+# Exact searches whose candidate lists add up to more than this many nodes
+# run on HEAVY instead of inline.
+SEARCH_INLINE_CANDIDATES = 5_000
+
+
+def search_is_wide(store: HierarchyStore, q: str, level: str, fuzzy: bool) -> bool:
+    """
+    Whether find_hits() for this query is expensive enough to go to HEAVY:
+    every fuzzy search, and exact searches with many candidates (short or
+    common n-grams). Candidate lists are posting-list lookups, so this
+    costs a few bisects.
+    """
+    if fuzzy and len(fold(q)) >= 3 and level != "place":
+        return True
+    qn = norm(q)
+    total = sum(len(search_candidates(store, qn, lvl)) for lvl in search_levels(level))
+    return total > SEARCH_INLINE_CANDIDATES
+
+
+async def run_search(store: HierarchyStore, q: str, level: str, limit: int, fuzzy: bool) -> List[Tuple[int, int, Optional[float]]]:
+    if search_is_wide(store, q, level, fuzzy):
+        return await HEAVY.run(find_hits, store, q, level, limit, fuzzy)
+    return find_hits(store, q, level, limit, fuzzy)
+
+
+# Flush the CSV buffer to the client once it holds this many characters.
+CSV_CHUNK_SIZE = 64 * 1024
+
+
+def csv_chunks(rows: Iterable[Sequence[Any]]) -> Iterator[str]:
+    """
+    Encode rows lazily, yielding roughly CSV_CHUNK_SIZE characters at a time.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= CSV_CHUNK_SIZE:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def csv_stream(rows: Iterable[Sequence[Any]], filename: str) -> StreamingResponse:
+    """
+    Stream CSV without storing a physical file.
+    """
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"'
+    }
+    return HeavyStreamingResponse(HEAVY.stream(csv_chunks(rows)), media_type="text/csv", headers=headers)
+
+
+# Brotli's default (11) takes tens of seconds on a country-wide CSV; 5 is
+# within a few percent of its size at a fraction of the time.
+BROTLI_QUALITY = 5
+
+
+class ExportEntry:
+    __slots__ = ("body", "gzip", "br", "etag")
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.gzip = gzip.compress(body, compresslevel=6)
+        self.br = brotli.compress(body, quality=BROTLI_QUALITY) if brotli is not None else None
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gzip) + (len(self.br) if self.br else 0)
+
+
+class ExportCache:
+    """
+    LRU cache of rendered exports, bounded by the total size of the stored
+    payloads (plain + compressed).
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[Any, ...], ExportEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[ExportEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple[Any, ...], entry: ExportEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size
+            self._entries[key] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+EXPORT_CACHE = ExportCache(EXPORT_CACHE_MAX_BYTES, EXPORT_CACHE_MAX_ENTRY_BYTES)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str, wildcard: bool = True) -> bool:
+    """
+    Whether If-None-Match lists `etag`. `*` only counts with `wildcard`,
+    i.e. when the resource is known to exist.
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (wildcard and tag == "*") or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class CachedResponse:
+    __slots__ = ("body", "headers", "expires")
+
+    def __init__(self, body: bytes, headers: List[Tuple[bytes, bytes]], expires: float) -> None:
+        self.body = body
+        self.headers = headers
+        self.expires = expires
+
+
+class ResponseCache:
+    """
+    LRU cache of rendered listing/search bodies, bounded by total body size,
+    with entries expiring after `ttl` seconds. Keys include the dataset
+    version, so a reload never serves stale bodies.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[Any, ...], CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                del self._entries[key]
+                self.bytes -= len(entry.body)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple[Any, ...], body: bytes, headers: List[Tuple[bytes, bytes]]) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old.body)
+            self._entries[key] = CachedResponse(body, headers, time.monotonic() + self.ttl)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted.body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+RESPONSE_CACHE = ResponseCache(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL)
+
+
+def response_cache_key(store: HierarchyStore, path: str, query_string: bytes) -> Tuple[Any, ...]:
+    """
+    Path segments are compared the way the routes compare names (norm), and
+    query parameters regardless of their order.
+    """
+    segments = tuple(norm(seg) for seg in path.split("/") if seg)
+    query = tuple(sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)))
+    return (store.source, segments, query)
+
+
+def query_dataset(query_string: bytes) -> str:
+    """
+    The dataset a request's `dataset=` parameter selects.
+    """
+    dataset = DATASET_NAME
+    for name, value in parse_qsl(query_string.decode("latin-1")):
+        if name == "dataset" and value:
+            dataset = value
+    return dataset
+
+
+# Digest of this code, so that a deploy that changes how responses look
+# (fields, headers) also changes their ETags: clients and CDNs holding a
+# body from the previous code must not get a 304 for it.
+APP_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:16]
+
+
+def response_etag(key: Tuple[Any, ...]) -> str:
+    digest = hashlib.sha256(repr((APP_VERSION,) + key[1:]).encode("utf-8")).hexdigest()[:16]
+    return f'"{key[0][:16]}-{digest}"'
+
+
+class ResponseCacheMiddleware:
+    """
+    Caches 200 responses of GET /regions... and /search, and tags them with
+    an ETag derived from the dataset version, APP_VERSION and the
+    normalized request. Because the tag does not depend on the body, an
+    If-None-Match listing it is answered with 304 before the cache or the
+    route is touched;
+    `If-None-Match: *` only once a 200 for the URL is cached.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        path = scope.get("path", "") if scope["type"] == "http" else ""
+        if scope.get("method") != "GET" or not (path == "/search" or path.startswith("/regions")):
+            await self.app(scope, receive, send)
+            return
+
+        query_string = scope.get("query_string", b"")
+        dataset = query_dataset(query_string)
+        store = STORES.get(dataset)
+        if store is None:
+            await self.app(scope, receive, send)
+            return
+        key = response_cache_key(store, path, query_string)
+        etag = response_etag(key)
+        validators = [
+            (b"etag", etag.encode("latin-1")),
+            (b"cache-control", f"public, max-age={RESPONSE_CACHE_MAX_AGE}".encode("latin-1")),
+        ]
+        if_none_match = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"if-none-match"), None)
+        # Before the route has run, the URL may not exist (404) or be
+        # invalid (422), so `*` is only honoured for a cached 200.
+        if etag_matches(if_none_match, etag, wildcard=False):
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        entry = RESPONSE_CACHE.get(key)
+        if entry is not None and etag_matches(if_none_match, etag):
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if entry is not None:
+            await send({"type": "http.response.start", "status": 200, "headers": entry.headers})
+            await send({"type": "http.response.body", "body": entry.body})
+            return
+
+        start: Dict[str, Any] = {}
+        parts: List[bytes] = []
+
+        async def capture(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                start.update(message)
+                if message["status"] == 200:
+                    message = dict(message, headers=list(message.get("headers", [])) + validators)
+                    start["headers"] = message["headers"]
+            elif message["type"] == "http.response.body" and start.get("status") == 200:
+                parts.append(message.get("body", b""))
+                # Only cache if the body was rendered against the store
+                # the key was computed for.
+                if not message.get("more_body", False) and STORES.get(dataset) is store:
+                    RESPONSE_CACHE.put(key, b"".join(parts), start["headers"])
+            await send(message)
+
+        await self.app(scope, receive, capture)
+
+
+class DatasetPrefixMiddleware:
+    """
+    Serves every route under /datasets/{name}/ too, by rewriting the
+    request: /datasets/v4/regions is /regions?dataset=v4.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        path = scope.get("path", "") if scope["type"] == "http" else ""
+        if path.startswith("/datasets/"):
+            name, sep, rest = path[len("/datasets/") :].partition("/")
+            if name and sep:
+                raw_path = scope.get("raw_path") or quote(path).encode("latin-1")
+                query = scope.get("query_string", b"")
+                param = b"dataset=" + quote(name, safe="").encode("latin-1")
+                scope = dict(
+                    scope,
+                    path="/" + rest,
+                    raw_path=b"/" + raw_path[len(b"/datasets/") :].partition(b"/")[2],
+                    query_string=query + b"&" + param if query else param,
+                )
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(ResponseCacheMiddleware)
+if METRICS is not None:
+    # Outside the cache so it also times cached responses.
+    app.add_middleware(MetricsMiddleware, metrics=METRICS)
+# Outermost, so everything else sees the rewritten path.
+app.add_middleware(DatasetPrefixMiddleware)
+
+
+def tee_into_cache(key: Tuple[Any, ...], chunks: Iterator[str]) -> Iterator[bytes]:
+    """
+    Pass encoded chunks through to the client and, if the export completes
+    within the entry size limit, store it in EXPORT_CACHE.
+    """
+    parts: Optional[List[bytes]] = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        if parts is not None:
+            size += len(data)
+            if size > EXPORT_CACHE.max_entry_bytes:
+                parts = None
+            else:
+                parts.append(data)
+        yield data
+    if parts is not None:
+        # Compressing takes a while for big exports; don't hold the
+        # response open for it.
+        body = b"".join(parts)
+        COMPRESSOR.submit(lambda: EXPORT_CACHE.put(key, ExportEntry(body)))
+
+
+# Compresses completed exports for EXPORT_CACHE, one at a time.
+COMPRESSOR = ThreadPoolExecutor(1, thread_name_prefix="export-compress")
+
+
+def accepts_encoding(accept_encoding: str, coding: str) -> bool:
+    """
+    True if an Accept-Encoding header allows `coding` (q > 0), directly or
+    through `*`.
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            k, _, v = param.partition("=")
+            if k.strip().lower() == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if name.strip():
+            weights[name.strip().lower()] = q
+    return weights.get(coding, weights.get("*", 0.0)) > 0
+
+
+def cached_export(
+    request: Request,
+    key: Tuple[Any, ...],
+    chunks: Callable[[], Iterator[str]],
+    filename: str,
+    media_type: str = "text/csv",
+) -> Response:
+    """
+    Serve a text export from EXPORT_CACHE (honouring If-None-Match and
+    Accept-Encoding), or stream it and cache the result for next time.
+    """
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Vary": "Accept-Encoding",
+    }
+    entry = EXPORT_CACHE.get(key)
+    if entry is None:
+        body = HEAVY.stream(tee_into_cache(key, chunks()))
+        return HeavyStreamingResponse(body, media_type=media_type, headers=headers)
+
+    headers["ETag"] = entry.etag
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+
+    accept = request.headers.get("accept-encoding", "")
+    body = entry.body
+    if entry.br is not None and accepts_encoding(accept, "br"):
+        body = entry.br
+        headers["Content-Encoding"] = "br"
+    elif accepts_encoding(accept, "gzip"):
+        body = entry.gzip
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, media_type=media_type, headers=headers)
+
+
+def export_streets(store: HierarchyStore, r: Optional[int], d: Optional[int], w: Optional[int]) -> range:
+    """
+    Ids of the streets below the given (already validated) filters: one
+    contiguous range, since siblings are stored together.
+    """
+    if w is not None:
+        return store.children(WARD, w)
+    if d is not None:
+        return store.descendants(DISTRICT, d, d + 1, STREET)
+    if r is not None:
+        return store.descendants(REGION, r, r + 1, STREET)
+    return range(len(store.levels[STREET]))
+
+
+def iter_streets(store: HierarchyStore, streets: range) -> Iterator[Tuple[str, str, str, int]]:
+    """
+    Yield (region name, district name, ward name, street id) for a street
+    range, reading the ancestors from the export table.
+    """
+    table = store.table
+    ward_of = store.levels[STREET].parent
+    last: Tuple[int, int, int] = (-1, -1, -1)
+    names: Tuple[str, str, str] = ("", "", "")
+    for si in streets:
+        ids = (table.street_region[si], table.street_district[si], ward_of[si])
+        if ids != last:
+            last = ids
+            names = (store.name(REGION, ids[0]), store.name(DISTRICT, ids[1]), store.name(WARD, ids[2]))
+        yield names[0], names[1], names[2], si
+
+
+def export_filter(
+    store: HierarchyStore,
+    region: Optional[str], district: Optional[str], ward: Optional[str]
+) -> Tuple[Optional[int], Optional[int], Optional[int], str]:
+    """
+    Validate the optional export filters up front (so a 404 is raised before
+    streaming starts) and return their node ids plus a filename stem.
+    Lower filters are ignored when a higher one is missing.
+    """
+    r = optional_region(store, region)
+    if r is None:
+        return None, None, None, "tanzania"
+    d = optional_district(store, r, district)
+    if d is None:
+        return r, None, None, norm(region or "").replace(" ", "_")
+    w = optional_ward(store, d, ward)
+    if w is None:
+        return r, d, None, (norm(region or "") + "_" + norm(district or "")).replace(" ", "_")
+    safe = (norm(region or "") + "_" + norm(district or "") + "_" + norm(ward or "")).replace(" ", "_")
+    return r, d, w, safe
+
+
+PLACE_COLUMNS = ("region", "district", "ward", "street", "place")
+STREET_COLUMNS = ("region", "district", "ward", "street", "places_count")
+
+
+def place_rows(store: HierarchyStore, streets: range) -> Iterator[List[Any]]:
+    """
+    Export rows of the places on `streets`; a street without places has
+    one row with place None.
+    """
+    for r_name, d_name, w_name, si in iter_streets(store, streets):
+        s_name = store.name(STREET, si)
+        places = store.places(si)
+        if not places:
+            yield [r_name, d_name, w_name, s_name, None]
+            continue
+        for p in places:
+            yield [r_name, d_name, w_name, s_name, p]
+
+
+def street_rows(store: HierarchyStore, streets: range) -> Iterator[List[Any]]:
+    for r_name, d_name, w_name, si in iter_streets(store, streets):
+        yield [r_name, d_name, w_name, store.name(STREET, si), store.place_count(si)]
+
+
+def ndjson_chunks(columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> Iterator[str]:
+    """
+    One JSON object per row, batched like csv_chunks().
+    """
+    return json_lines(dict(zip(columns, row)) for row in rows)
+
+
+def json_lines(objs: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    buf: List[str] = []
+    size = 0
+    for obj in objs:
+        line = json.dumps(obj, ensure_ascii=False) + "\n"
+        buf.append(line)
+        size += len(line)
+        if size >= CSV_CHUNK_SIZE:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def arrow_ids(column: Any, ids: range) -> Any:
+    """
+    Zero-copy Arrow view of column[ids.start:ids.stop] (a uint32 array).
+    """
+    view = memoryview(column)[ids.start : ids.stop]
+    return pyarrow.Array.from_buffers(pyarrow.uint32(), len(ids), [None, pyarrow.py_buffer(view)])
+
+
+def arrow_names(store: HierarchyStore, string_ids: Any) -> Any:
+    """
+    Dictionary-encoded string column for an array of string ids: only the
+    distinct strings are decoded, and ids not in the table (NO_PLACE)
+    become nulls.
+    """
+    distinct = pyarrow.compute.unique(string_ids)
+    distinct = pyarrow.compute.filter(distinct, pyarrow.compute.not_equal(distinct, NO_PLACE))
+    indices = pyarrow.compute.index_in(string_ids, value_set=distinct)
+    dictionary = pyarrow.array([store.strings[i] for i in distinct.to_pylist()], type=pyarrow.string())
+    return pyarrow.DictionaryArray.from_arrays(indices, dictionary)
+
+
+def arrow_table(store: HierarchyStore, kind: str, streets: range) -> Any:
+    """
+    The places or streets export of a street range as an Arrow table. Each
+    column is a slice of the export table (plus a gather for ancestors),
+    with no per-row Python work.
+    """
+    table = store.table
+
+    def level_names(level: int, nodes: Any) -> Any:
+        name_ids = arrow_ids(store.levels[level].name, range(len(store.levels[level])))
+        return arrow_names(store, pyarrow.compute.take(name_ids, nodes))
+
+    if kind == "places":
+        street = arrow_ids(table.row_street, table.rows(streets))
+        place = arrow_names(store, arrow_ids(table.row_place, table.rows(streets)))
+    else:
+        street = pyarrow.array(streets, type=pyarrow.uint32())
+        starts = arrow_ids(store.place_start, range(streets.start, streets.stop + 1))
+        place = pyarrow.compute.subtract(starts[1:], starts[:-1])
+
+    full = range(len(store.levels[STREET]))
+    columns = [
+        level_names(REGION, pyarrow.compute.take(arrow_ids(table.street_region, full), street)),
+        level_names(DISTRICT, pyarrow.compute.take(arrow_ids(table.street_district, full), street)),
+        level_names(WARD, pyarrow.compute.take(arrow_ids(store.levels[STREET].parent, full), street)),
+        level_names(STREET, street),
+        place,
+    ]
+    return pyarrow.table(columns, names=PLACE_COLUMNS if kind == "places" else STREET_COLUMNS)
+
+
+def columnar_export(store: HierarchyStore, kind: str, streets: range, fmt: str) -> bytes:
+    table = arrow_table(store, kind, streets)
+    sink = pyarrow.BufferOutputStream()
+    if fmt == "parquet":
+        pyarrow.parquet.write_table(table, sink, compression="zstd")
+    else:
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+async def export_response(
+    request: Request,
+    store: HierarchyStore,
+    kind: str,
+    streets: range,
+    fmt: str,
+    stem: str,
+) -> Response:
+    """
+    The places or streets export of a street range in the requested
+    format. Text formats are streamed and cached in EXPORT_CACHE; Arrow
+    and Parquet are built in one go on HEAVY (they need pyarrow).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {fmt} (expected one of {', '.join(EXPORT_FORMATS)})")
+    media_type, ext = EXPORT_FORMATS[fmt]
+    filename = f"{stem}_{kind}.{ext}"
+    if fmt in ("arrow", "parquet"):
+        if pyarrow is None:
+            raise HTTPException(status_code=501, detail=f"format={fmt} requires pyarrow, which is not installed")
+        body = await HEAVY.run(columnar_export, store, kind, streets, fmt)
+        return Response(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+    columns = PLACE_COLUMNS if kind == "places" else STREET_COLUMNS
+    rows_of = place_rows if kind == "places" else street_rows
+
+    def chunks() -> Iterator[str]:
+        rows = rows_of(store, streets)
+        if fmt == "ndjson":
+            return ndjson_chunks(columns, rows)
+        return csv_chunks(itertools.chain([columns], rows))
+
+    key = (kind, fmt, store.source, streets.start, streets.stop)
+    return cached_export(request, key, chunks, filename, media_type)
+
+
+def require_admin(request: Request) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+async def dataset_store(
+    dataset: Optional[str] = Query(default=None, description="Dataset to query (see /datasets); the default one if omitted."),
+) -> HierarchyStore:
+    """
+    The store of the requested dataset, captured once so the whole request
+    sees one version.
+    """
+    store = STORES.get(dataset or DATASET_NAME)
+    if store is None:
+        raise HTTPException(status_code=404, detail=f"Dataset not found: {dataset}")
+    return store
+
+
+def require_version(version: str) -> HierarchyStore:
+    """
+    The loaded store with this dataset name, or whose version starts with
+    `version` (at least 6 characters, as shown by /datasets).
+    """
+    store = STORES.get(version)
+    if store is None and len(version) >= 6:
+        store = next((s for s in STORES.values() if s.source.startswith(version)), None)
+    if store is None:
+        raise HTTPException(status_code=404, detail=f"Version not loaded: {version}")
+    return store
+
+
+def optional_region(store: HierarchyStore, region: Optional[str]) -> Optional[int]:
+    if not region:
+        return None
+    return require_region(store, region)
+
+
+def optional_district(store: HierarchyStore, r: int, district: Optional[str]) -> Optional[int]:
+    if not district:
+        return None
+    return require_district(store, r, district)
+
+
+def optional_ward(store: HierarchyStore, d: int, ward: Optional[str]) -> Optional[int]:
+    if not ward:
+        return None
+    return require_ward(store, d, ward)
+
+
+def optional_street(store: HierarchyStore, w: int, street: Optional[str]) -> Optional[int]:
+    if not street:
+        return None
+    si = store.find(STREET, store.children(WARD, w), norm(street))
+    if si is None:
+        raise HTTPException(status_code=404, detail=f"Street not found: {street}")
+    return si
+
+
+def subtree_stats(store: HierarchyStore, level: Optional[int], i: int = 0) -> StatsOut:
+    """
+    Counts below a node (or the whole country when `level` is None). Every
+    subtree is a contiguous id range at each level below it, so each count
+    is a difference of two offsets; nothing is walked or precomputed.
+    """
+    if level is None:
+        counts = {name: len(lv) for name, lv in zip(LEVELS, store.levels)}
+        streets = counts["street"]
+        covered = sum(
+            len(store.descendants(REGION, r, r + 1, STREET))
+            for r in range(len(store.levels[REGION]))
+            if store.region_postcode(r) is not None
+        )
+        return StatsOut(
+            level="country",
+            regions=counts["region"],
+            districts=counts["district"],
+            wards=counts["ward"],
+            streets=streets,
+            places=len(store.place_name),
+            streets_with_postcode=covered,
+            postcode_coverage=round(covered / streets, 4) if streets else 0.0,
+        )
+
+    below = {LEVELS[t]: store.descendants(level, i, i + 1, t) for t in range(level + 1, len(LEVELS))}
+    streets_range = below.get("street", range(i, i + 1))
+    region = i
+    for lvl in range(level, REGION, -1):
+        region = store.levels[lvl].parent[region]
+    postcode = store.region_postcode(region)
+    covered = len(streets_range) if postcode is not None else 0
+    return StatsOut(
+        level=LEVELS[level],
+        path=store.path(level, i),
+        districts=len(below["district"]) if "district" in below else None,
+        wards=len(below["ward"]) if "ward" in below else None,
+        streets=len(below["street"]) if "street" in below else None,
+        places=store.place_start[streets_range.stop] - store.place_start[streets_range.start],
+        postcode=postcode,
+        streets_with_postcode=covered,
+        postcode_coverage=round(covered / len(streets_range), 4) if len(streets_range) else 0.0,
+    )
+
+
+
+def node_event(op: str, store: HierarchyStore, level: int, i: int) -> Dict[str, Any]:
+    event: Dict[str, Any] = {"op": op, "level": LEVELS[level], "path": store.path(level, i)}
+    if op == "added":
+        event["name"] = store.name(level, i)
+        if level == REGION:
+            event["postcode"] = store.region_postcode(i)
+        elif level == STREET:
+            event["places"] = store.places(i)
+    return event
+
+
+def added_events(store: HierarchyStore, level: int, i: int) -> Iterator[Dict[str, Any]]:
+    """
+    An added node and everything below it, parents first.
+    """
+    yield node_event("added", store, level, i)
+    for target in range(level + 1, len(LEVELS)):
+        for j in store.descendants(level, i, i + 1, target):
+            yield node_event("added", store, target, j)
+
+
+def has_content(store: HierarchyStore, level: int, i: int) -> bool:
+    """
+    Whether node i has anything below it (places, for a street). Empty
+    nodes all share one digest, which says nothing about their identity.
+    """
+    if level == STREET:
+        return store.place_start[i] < store.place_start[i + 1]
+    return len(store.children(level, i)) > 0
+
+
+def unique_digests(store: HierarchyStore, level: int, ids: List[int]) -> Dict[int, int]:
+    """
+    digest -> node for the digests that only one of `ids` has, among the
+    nodes with content.
+    """
+    digests = store.levels[level].digest
+    seen: Dict[int, Optional[int]] = {}
+    for i in ids:
+        if not has_content(store, level, i):
+            continue
+        seen[digests[i]] = None if digests[i] in seen else i
+    return {d: i for d, i in seen.items() if i is not None}
+
+
+def diff_siblings(old: HierarchyStore, new: HierarchyStore, level: int, a: range, b: range) -> Iterator[Dict[str, Any]]:
+    """
+    Changes between two sibling ranges, merged by key (both are sorted).
+    A removed and an added node with the same digest, unique among these
+    siblings on both sides and not empty, are reported as one rename.
+    """
+    old_keys, new_keys = old.keys[level], new.keys[level]
+    removed: List[int] = []
+    added: List[int] = []
+    i, j = a.start, b.start
+    while i < a.stop or j < b.stop:
+        if j == b.stop or (i < a.stop and old_keys[i] < new_keys[j]):
+            removed.append(i)
+            i += 1
+        elif i == a.stop or new_keys[j] < old_keys[i]:
+            added.append(j)
+            j += 1
+        else:
+            yield from diff_nodes(old, new, level, i, j)
+            i += 1
+            j += 1
+    if removed and added:
+        gone = unique_digests(old, level, removed)
+        came = unique_digests(new, level, added)
+        for digest in sorted(gone.keys() & came.keys(), key=came.__getitem__):
+            i, j = gone[digest], came[digest]
+            yield dict(node_event("renamed", new, level, j), name=new.name(level, j), **{"from": old.path(level, i)})
+            removed.remove(i)
+            added.remove(j)
+    for i in removed:
+        yield node_event("removed", old, level, i)
+    for j in added:
+        yield from added_events(new, level, j)
+
+
+def diff_nodes(old: HierarchyStore, new: HierarchyStore, level: int, i: int, j: int) -> Iterator[Dict[str, Any]]:
+    """
+    Changes between two nodes with the same key, skipping the subtree when
+    the digests match.
+    """
+    if old.name(level, i) != new.name(level, j):
+        yield dict(node_event("renamed", new, level, j), name=new.name(level, j), **{"from": old.path(level, i)})
+    if old.levels[level].digest[i] == new.levels[level].digest[j]:
+        return
+    if level == REGION and old.postcode[i] != new.postcode[j]:
+        yield dict(node_event("changed", new, level, j), postcode=new.region_postcode(j))
+    if level == STREET:
+        before, after = old.places(i), new.places(j)
+        yield dict(
+            node_event("changed", new, level, j),
+            places=after,
+            places_added=sorted(set(after) - set(before)),
+            places_removed=sorted(set(before) - set(after)),
+        )
+        return
+    yield from diff_siblings(old, new, level + 1, old.children(level, i), new.children(level, j))
+
+
+def diff_stores(old: HierarchyStore, new: HierarchyStore) -> Iterator[Dict[str, Any]]:
+    """
+    Everything that changed from `old` to `new`, as delta events. Only
+    subtrees whose digests differ are visited.
+    """
+    yield {"op": "delta", "from": old.source[:12], "to": new.source[:12]}
+    if old.source != new.source:
+        yield from diff_siblings(old, new, REGION, range(len(old.levels[REGION])), range(len(new.levels[REGION])))
+
+
+# Routes
+@app.get("/health")
+async def health() -> Dict[str, Any]:
+    store = STORE
+    return {
+        "status": "ok",
+        "country": store.country,
+        "regions": len(store.levels[REGION]),
+        "version": store.source[:12],
+        "loaded_at": store.loaded_at,
+        "datasets": {name: s.source[:12] for name, s in STORES.items()},
+        "reloading": RELOADER.running,
+        "last_reload_error": RELOADER.last_error,
+        "response_cache": {
+            "entries": len(RESPONSE_CACHE),
+            "bytes": RESPONSE_CACHE.bytes,
+            "hits": RESPONSE_CACHE.hits,
+            "misses": RESPONSE_CACHE.misses,
+        },
+    }
+
+
+@app.get("/datasets", response_model=List[DatasetOut])
+async def list_datasets() -> List[DatasetOut]:
+    """
+    The datasets being served. Any route takes `dataset=<name>`, or can be
+    called under /datasets/<name>/ (e.g. /datasets/v4/regions).
+    """
+    return [
+        DatasetOut(
+            name=name,
+            version=store.source[:12],
+            loaded_at=store.loaded_at,
+            default=name == DATASET_NAME,
+            regions=len(store.levels[REGION]),
+            streets=len(store.levels[STREET]),
+        )
+        for name, store in STORES.items()
+    ]
+
+
+@app.get("/delta")
+async def delta(
+    request: Request,
+    since: str = Query(..., description="Dataset name or version (see /datasets) to compare against."),
+    store: HierarchyStore = Depends(dataset_store),
+) -> Response:
+    """
+    NDJSON of the changes from the `since` version to this dataset. Both
+    must be loaded (see DATASETS). The first line names the two versions;
+    each further line is one event: `added` (a node and, on the following
+    lines, everything below it), `removed` (a node and its subtree),
+    `renamed` (the paths below it change too), or `changed` (a street's
+    places or a region's postcode).
+    """
+    old = require_version(since)
+    filename = f"delta_{old.source[:12]}_{store.source[:12]}.ndjson"
+    key = ("delta", old.source, store.source)
+    return cached_export(request, key, lambda: json_lines(diff_stores(old, store)), filename, "application/x-ndjson")
+
+
+@app.post("/admin/reload", status_code=202, include_in_schema=False, dependencies=[Depends(require_admin)])
+def admin_reload() -> Dict[str, Any]:
+    """
+    Rebuild the datasets in the background and swap them in when ready.
+    """
+    started = RELOADER.start()
+    return {"status": "started" if started else "already running", "version": STORE.source[:12]}
+
+
+@app.get("/admin/profiles", include_in_schema=False, dependencies=[Depends(require_admin)])
+def admin_profiles() -> List[Dict[str, Any]]:
+    """
+    Summaries of the buffered request profiles, newest first.
+    """
+    keys = ("id", "at", "method", "path", "query", "status", "duration_ms")
+    return [{k: entry[k] for k in keys} for entry in reversed(PROFILES)]
+
+
+@app.get("/admin/profiles/{profile_id}", include_in_schema=False, dependencies=[Depends(require_admin)])
+def admin_profile(profile_id: int, format: str = Query(default="json", description="json | text")) -> Response:
+    """
+    One buffered profile: the top functions by cumulative time, the pstats
+    report and, when tracemalloc was running, the top allocation sites.
+    """
+    entry = next((e for e in PROFILES if e["id"] == profile_id), None)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+    if format == "text":
+        return Response(entry["stats"], media_type="text/plain; charset=utf-8")
+    return FastJSONResponse(entry)
+
+
+@app.get("/regions", response_model=List[RegionOut])
+async def list_regions(
+    q: Optional[str] = Query(default=None, description="Filter by region name (contains)."),
+    limit: int = Query(default=50, ge=1, le=500),
+    offset: int = Query(default=0, ge=0),
+    store: HierarchyStore = Depends(dataset_store),
+) -> FastJSONResponse:
+    regions: Sequence[int] = range(len(store.levels[REGION]))
+    if q:
+        qn = norm(q)
+        regions = [r for r in regions if qn in store.key(REGION, r)]
+    return listing_response(store, REGION, paginate(regions, limit, offset))
+
+
+@app.get("/regions/{region}/districts", response_model=List[DistrictOut])
+async def list_districts(
+    request: Request,
+    region: str,
+    limit: int = Query(default=100, ge=1, le=2000),
+    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="Token from X-Next-Cursor; resumes after the previous page."),
+    store: HierarchyStore = Depends(dataset_store),
+) -> FastJSONResponse:
+    r = require_region(store, region)
+    return cursor_page(request, store, DISTRICT, store.children(REGION, r), limit, offset, cursor)
+
+
+@app.get("/regions/{region}/districts/{district}/wards", response_model=List[WardOut])
+async def list_wards(
+    request: Request,
+    region: str,
+    district: str,
+    limit: int = Query(default=200, ge=1, le=2000),
+    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="Token from X-Next-Cursor; resumes after the previous page."),
+    store: HierarchyStore = Depends(dataset_store),
+) -> FastJSONResponse:
+    r = require_region(store, region)
+    d = require_district(store, r, district)
+    return cursor_page(request, store, WARD, store.children(DISTRICT, d), limit, offset, cursor)
+
+
+@app.get("/regions/{region}/districts/{district}/wards/{ward}/streets", response_model=List[StreetOut])
+async def list_streets(
+    request: Request,
+    region: str,
+    district: str,
+    ward: str,
+    limit: int = Query(default=500, ge=1, le=5000),
+    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="Token from X-Next-Cursor; resumes after the previous page."),
+    store: HierarchyStore = Depends(dataset_store),
+) -> FastJSONResponse:
+    r = require_region(store, region)
+    d = require_district(store, r, district)
+    w = require_ward(store, d, ward)
+    return cursor_page(request, store, STREET, store.children(WARD, w), limit, offset, cursor)
+
+
+@app.get("/stats", response_model=StatsOut, response_model_exclude_none=True)
+async def stats(
+    region: Optional[str] = Query(default=None),
+    district: Optional[str] = Query(default=None),
+    ward: Optional[str] = Query(default=None),
+    street: Optional[str] = Query(default=None),
+    store: HierarchyStore = Depends(dataset_store),
+) -> StatsOut:
+    """
+    Counts of districts, wards, streets and places below the country or
+    any node, and how many of those streets have a (region) postcode.
+    Filters narrow down like the exports: lower ones are ignored when a
+    higher one is missing.
+    """
+    r = optional_region(store, region)
+    if r is None:
+        return subtree_stats(store, None)
+    d = optional_district(store, r, district)
+    if d is None:
+        return subtree_stats(store, REGION, r)
+    w = optional_ward(store, d, ward)
+    if w is None:
+        return subtree_stats(store, DISTRICT, d)
+    si = optional_street(store, w, street)
+    if si is None:
+        return subtree_stats(store, WARD, w)
+    return subtree_stats(store, STREET, si)
+
+
+@app.get("/places/{place}", response_model=List[PlaceOut])
+async def find_place(
+    place: str,
+    limit: int = Query(default=100, ge=1, le=1000),
+    store: HierarchyStore = Depends(dataset_store),
+) -> List[PlaceOut]:
+    """
+    Every street containing a place with exactly this name (case and
+    spacing ignored), with its full path. Use /search?level=place for
+    partial names.
+    """
+    out = []
+    for j in store.find_places(norm(place))[:limit]:
+        si = store.place_street(j)
+        w = store.levels[STREET].parent[si]
+        d = store.levels[WARD].parent[w]
+        r = store.levels[DISTRICT].parent[d]
+        out.append(
+            PlaceOut(
+                name=store.strings[store.place_name[j]],
+                region=store.name(REGION, r),
+                district=store.name(DISTRICT, d),
+                ward=store.name(WARD, w),
+                street=store.name(STREET, si),
+                path=store.place_path(j),
+            )
+        )
+    if not out:
+        raise HTTPException(status_code=404, detail=f"Place not found: {place}")
+    return out
+
+
+@app.get("/search", response_model=List[SearchHit], response_model_exclude_none=True)
+async def search(
+    q: str = Query(..., min_length=2, description="Search keyword (contains)."),
+    level: str = Query(default="all", description="all | region | district | ward | street | place"),
+    limit: int = Query(default=50, ge=1, le=200),
+    fuzzy: bool = Query(default=False, description="Typo-tolerant matching, ranked by relevance score (not for places)."),
+    store: HierarchyStore = Depends(dataset_store),
+) -> FastJSONResponse:
+    hits = await run_search(store, q, level, limit, fuzzy)
+    return FastJSONResponse(json_array(hit_fragment(store, lvl, i, score) for lvl, i, score in hits))
+
+
+@app.get("/autocomplete", response_model=Completions, response_model_exclude_none=True)
+async def autocomplete(
+    q: str = Query(..., min_length=1, description="Prefix of any word of the name."),
+    level: str = Query(default="all", description="all | region | district | ward | street"),
+    limit: int = Query(default=10, ge=1, le=COMPLETE_MAX_K, description="Completions per level."),
+    store: HierarchyStore = Depends(dataset_store),
+) -> FastJSONResponse:
+    """
+    Type-ahead completions per level, best first (most children, or most
+    places for streets).
+    """
+    prefix = norm(q)
+    parts = []
+    for lvl, lvl_name in enumerate(SEARCH_LEVELS):
+        completer = store.levels[lvl].complete
+        ids: List[int] = []
+        if prefix and level in ("all", lvl_name) and completer is not None:
+            ids = completer.complete(store.keys[lvl], prefix, limit)
+        raw, hit_json = store.strings.raw, store.levels[lvl].hit_json
+        parts.append(b'"%s":%s' % (lvl_name.encode(), json_array(raw(hit_json[i]) for i in ids)))
+    return FastJSONResponse(b"{" + b",".join(parts) + b"}")
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator reads the request body while the
+    response is being sent. The stock class listens for disconnects on
+    `receive` meanwhile, which would swallow request chunks; here a
+    disconnect surfaces from request.stream() instead. The body is computed
+    on HEAVY: a slot is taken when the response is created (so a refusal is
+    a clean 503) and given back however the response ends.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        HEAVY.admit()
+        super().__init__(*args, **kwargs)
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        try:
+            await self.stream_response(send)
+        finally:
+            HEAVY.release()
+
+
+@app.post("/resolve", response_model=List[AddressOut], response_model_exclude_none=True)
+async def resolve_batch(items: List[AddressIn], store: HierarchyStore = Depends(dataset_store)) -> Response:
+    """
+    Validate many partial addresses in one call. For each, every given
+    level is reported as matched (with its canonical name) or missed (with
+    close suggestions among the siblings).
+    """
+    if len(items) > RESOLVE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {RESOLVE_MAX_ITEMS} addresses per request; use /resolve/ndjson for larger batches",
+        )
+    resolver = Resolver(store)
+
+    def resolve_all() -> bytes:
+        # Encoded here too, so that serializing thousands of results stays
+        # off the event loop.
+        return json_array(resolver.resolve(a).model_dump_json(exclude_none=True).encode("utf-8") for a in items)
+
+    return FastJSONResponse(await HEAVY.run(resolve_all))
+
+
+@app.post("/resolve/ndjson")
+async def resolve_ndjson(request: Request, store: HierarchyStore = Depends(dataset_store)) -> StreamingResponse:
+    """
+    Streaming variant of /resolve: the body is newline-delimited JSON
+    addresses and the response has one result line per input line (an
+    {"error": ...} line for lines that don't parse or are longer than
+    RESOLVE_MAX_LINE_BYTES).
+    """
+    resolver = Resolver(store)
+    too_long = json.dumps({"error": f"Line longer than {RESOLVE_MAX_LINE_BYTES} bytes"}).encode("utf-8")
+
+    def resolve_lines(lines: List[Optional[bytes]]) -> bytes:
+        out = []
+        for line in lines:
+            if line is None:
+                out.append(too_long)
+                continue
+            try:
+                result = resolver.resolve(AddressIn.model_validate_json(line))
+            except ValueError as e:
+                out.append(json.dumps({"error": str(e).splitlines()[0]}).encode("utf-8"))
+                continue
+            out.append(result.model_dump_json(exclude_none=True).encode("utf-8"))
+        return b"\n".join(out) + b"\n"
+
+    async def results() -> Any:
+        pending = b""
+        # Inside a line already reported as too long: drop up to its end.
+        skipping = False
+        batch: List[Optional[bytes]] = []
+        async for chunk in request.stream():
+            *lines, pending = (pending + chunk).split(b"\n")
+            if skipping:
+                if not lines:
+                    pending = b""
+                    continue
+                lines.pop(0)
+                skipping = False
+            batch.extend(None if len(line) > RESOLVE_MAX_LINE_BYTES else line for line in lines if line.strip())
+            if len(pending) > RESOLVE_MAX_LINE_BYTES:
+                batch.append(None)
+                pending = b""
+                skipping = True
+            if len(batch) >= 1000:
+                yield await asyncio.wrap_future(HEAVY.submit(resolve_lines, batch))
+                batch = []
+        if pending.strip():
+            batch.append(pending)
+        if batch:
+            yield await asyncio.wrap_future(HEAVY.submit(resolve_lines, batch))
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.get("/download/places", include_in_schema=True)
+async def download_places(
+    request: Request,
+    region: Optional[str] = Query(default=None),
+    district: Optional[str] = Query(default=None),
+    ward: Optional[str] = Query(default=None),
+    format: str = Query(default="csv", description="csv | ndjson | arrow | parquet (arrow/parquet need pyarrow)."),
+    store: HierarchyStore = Depends(dataset_store),
+) -> Response:
+    """
+    Columns: region, district, ward, street, place (empty/null for a
+    street without places). Filters work as for /download/streets.
+    """
+    r, d, w, safe = export_filter(store, region, district, ward)
+    return await export_response(request, store, "places", export_streets(store, r, d, w), format, safe)
+
+
+@app.get("/download/search", include_in_schema=True)
+async def download_search(
+    q: str = Query(..., min_length=2),
+    level: str = Query(default="all"),
+    limit: int = Query(default=200, ge=1, le=2000),
+    fuzzy: bool = Query(default=False),
+    store: HierarchyStore = Depends(dataset_store),
+) -> StreamingResponse:
+    """
+    Same logic as /search, but returns a downloadable CSV.
+    """
+    hits = await run_search(store, q, level, limit, fuzzy)
+    rows = itertools.chain(
+        [["level", "name", "path"]],
+        ([hit_level(lvl), hit_name(store, lvl, i), hit_path(store, lvl, i)] for lvl, i, _ in hits),
+    )
+
+    safe = f"search_{norm(q).replace(' ', '_')}.csv"
+    return csv_stream(rows, safe)
+
+
+
+@app.get("/download/streets", include_in_schema=True)
+async def download_streets(
+    request: Request,
+    region: Optional[str] = Query(default=None),
+    district: Optional[str] = Query(default=None),
+    ward: Optional[str] = Query(default=None),
+    format: str = Query(default="csv", description="csv | ndjson | arrow | parquet (arrow/parquet need pyarrow)."),
+    store: HierarchyStore = Depends(dataset_store),
+) -> Response:
+    """
+    Columns: region, district, ward, street, places_count
+    Filters are optional:
+      - no filters => exports all streets in Tanzania
+      - region only => exports all streets in that region
+      - region + district => exports all streets in that district
+      - region + district + ward => exports all streets in that ward
+    """
+    r, d, w, safe = export_filter(store, region, district, ward)
+    return await export_response(request, store, "streets", export_streets(store, r, d, w), format, safe)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Tanzania Locations API tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build-snapshot", help="Compile the JSON dataset into a binary snapshot.")
+    build.add_argument("--data", type=Path, default=DATA_PATH, help="Source JSON (default: %(default)s).")
+    build.add_argument("--out", type=Path, default=SNAPSHOT_PATH, help="Snapshot to write (default: %(default)s).")
+    validate = sub.add_parser("validate", help="Report duplicates, conflicts and malformed nodes in a JSON dataset.")
+    validate.add_argument("--data", type=Path, default=DATA_PATH, help="Source JSON (default: %(default)s).")
+    args = parser.parse_args(argv)
+
+    if args.command == "build-snapshot":
+        store = load_json_store(DatasetSource(DATASET_NAME, args.data, args.out))
+        write_snapshot(store, args.out, args.data)
+        print(f"Wrote {args.out} ({args.out.stat().st_size} bytes, {len(store.levels[STREET])} streets)")
+    elif args.command == "validate":
+        _, _, issues = canonicalize(json.loads(args.data.read_bytes()))
+        for i in issues:
+            print(json.dumps(i, ensure_ascii=False))
+        print(f"{args.data}: {issue_summary(issues) or 'no issues'}", file=sys.stderr)
+        sys.exit(1 if issues else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Benchmarks for the Tanzania Locations API.
+
+    python bench.py gen --scale 10 --out bench_data.json
+    python bench.py run --data bench_data.json
+    python bench.py run --data bench_data.json --mode uvicorn --concurrency 16
+
+`gen` writes a synthetic dataset shaped like the real one. It clones an
+existing dataset `--scale` times (or starts from a generated one) so that
+behaviour at 10-100x the real size can be measured.
+
+`run` sends requests to every endpoint group and prints p50/p95/p99
+latency, requests per second and peak RSS for each group. By default
+the requests go to the ASGI app in-process through httpx. With
+`--mode uvicorn` they go to a local uvicorn server started for the run.
+Requires httpx.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+try:
+    import httpx
+except ImportError:  # only needed by `run`
+    httpx = None
+
+APP_DIR = Path(__file__).resolve().parent
+LEVELS = ("region", "district", "ward", "street")
+SYLLABLES = ("ki", "no", "ndo", "ni", "ma", "la", "pa", "bu", "gu", "ru", "ta", "mbe", "ka", "sa", "lam", "ngo", "zi", "wa", "mi", "chi")
+
+
+# Dataset generator
+def synthetic_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def base_dataset(rng: random.Random) -> Dict[str, Any]:
+    """
+    A country of roughly the real dataset's size: 31 regions, ~180
+    districts, ~3,900 wards, ~19,000 streets.
+    """
+    regions = []
+    for r in range(31):
+        districts = []
+        for _ in range(rng.randint(4, 8)):
+            wards = []
+            for _ in range(rng.randint(14, 28)):
+                streets = [
+                    {"NAME": synthetic_name(rng), "PLACES": [synthetic_name(rng) for _ in range(rng.randint(0, 4))]}
+                    for _ in range(rng.randint(2, 8))
+                ]
+                wards.append({"NAME": synthetic_name(rng), "STREETS": streets})
+            districts.append({"NAME": synthetic_name(rng), "WARD": wards})
+        regions.append({"REGION": f"{synthetic_name(rng)} {r + 1}", "POSTCODE": 10 + r, "DISTRIC": districts})
+    return {"country": "Tanzania", "regions": regions}
+
+
+def scale_dataset(data: Dict[str, Any], scale: int) -> Dict[str, Any]:
+    """
+    Keep the regions and repeat every region's districts `scale` times.
+    Copies get a numeric suffix, so each copy is a distinct subtree, and
+    the ward and street names (the search workload) repeat as in real data.
+    """
+    regions = []
+    for region in data.get("regions", []):
+        region = dict(region)
+        district_key = "DISTRIC" if "DISTRIC" in region else "DISTRICT"
+        districts = region.get(district_key) or []
+        copies = []
+        for n in range(scale):
+            for district in districts:
+                district = dict(district)
+                if n:
+                    district["NAME"] = f"{district.get('NAME', '')} {n + 1}"
+                copies.append(district)
+        region[district_key] = copies
+        regions.append(region)
+    return dict(data, regions=regions)
+
+
+# Workload
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[i]
+
+
+def sample_paths(data_path: Path, rng: random.Random, n: int) -> List[Tuple[str, str, str, str]]:
+    """
+    Up to `n` random (region, district, ward, street) name paths from the
+    dataset, used to build listing and search URLs.
+    """
+    data = json.loads(data_path.read_text(encoding="utf-8"))
+    paths = []
+    for region in data.get("regions", []):
+        for district in region.get("DISTRIC") or region.get("DISTRICT") or []:
+            for ward in district.get("WARD") or district.get("WARDS") or []:
+                for street in ward.get("STREETS") or []:
+                    paths.append((region.get("REGION", ""), district.get("NAME", ""), ward.get("NAME", ""), street.get("NAME", "")))
+    rng.shuffle(paths)
+    return paths[:n]
+
+
+def workload(paths: List[Tuple[str, str, str, str]], rng: random.Random, downloads: int) -> Dict[str, List[str]]:
+    """
+    URLs per benchmark group. Every group draws from many distinct URLs so
+    the response cache sees a realistic mix of hits and misses.
+    """
+    def q(s: str) -> str:
+        return quote(s, safe="")
+
+    def fragment(name: str) -> str:
+        name = name.lower()
+        size = min(len(name), rng.randint(3, 5))
+        start = rng.randint(0, len(name) - size)
+        return name[start : start + size]
+
+    groups: Dict[str, List[str]] = {
+        "regions": ["/regions"],
+        "districts": [f"/regions/{q(p[0])}/districts" for p in paths],
+        "wards": [f"/regions/{q(p[0])}/districts/{q(p[1])}/wards" for p in paths],
+        "streets": [f"/regions/{q(p[0])}/districts/{q(p[1])}/wards/{q(p[2])}/streets" for p in paths],
+    }
+    for lvl, level in enumerate(LEVELS):
+        groups[f"search level={level}"] = [f"/search?q={q(fragment(p[lvl]))}&level={level}" for p in paths]
+    groups["search level=all"] = [f"/search?q={q(fragment(p[rng.randrange(4)]))}" for p in paths]
+    groups["search fuzzy"] = [f"/search?q={q(p[3][:7].lower())}&fuzzy=true" for p in paths]
+    groups["autocomplete"] = [f"/autocomplete?q={q(p[3][:3].lower())}" for p in paths]
+    if downloads:
+        groups["download places"] = ["/download/places"] * downloads
+        groups["download streets"] = ["/download/streets"] * downloads
+    return groups
+
+
+async def run_group(client: Any, urls: List[str], requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    failures = 0
+    size = 0
+    queue = [urls[i % len(urls)] for i in range(requests)]
+
+    async def worker() -> None:
+        nonlocal failures, size
+        while queue:
+            url = queue.pop()
+            t0 = time.perf_counter()
+            r = await client.get(url)
+            latencies.append(time.perf_counter() - t0)
+            size += len(r.content)
+            if r.status_code >= 500:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "failures": failures,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "avg_bytes": size // max(1, len(latencies)),
+    }
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> float:
+    """
+    Peak resident set size of this process, or of `pid` (Linux only).
+    """
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+async def run_inprocess(args: argparse.Namespace, groups: Dict[str, List[str]]) -> Tuple[Dict[str, Dict[str, Any]], float, float]:
+    sys.path.insert(0, str(APP_DIR))
+    import app as api
+
+    t0 = time.perf_counter()
+    api.load_data()
+    load_time = time.perf_counter() - t0
+    results = {}
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, urls in groups.items():
+            results[name] = await run_group(client, urls, args.downloads if name.startswith("download") else args.requests, args.concurrency)
+            results[name]["peak_rss_mb"] = peak_rss_mb()
+    return results, load_time, peak_rss_mb()
+
+
+async def run_uvicorn(args: argparse.Namespace, groups: Dict[str, List[str]]) -> Tuple[Dict[str, Dict[str, Any]], float, float]:
+    base = f"http://127.0.0.1:{args.port}"
+    t0 = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=APP_DIR,
+        env=os.environ.copy(),
+    )
+    try:
+        async with httpx.AsyncClient(base_url=base, timeout=None) as client:
+            while True:
+                if server.poll() is not None:
+                    raise SystemExit("uvicorn exited during startup")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.05)
+            load_time = time.perf_counter() - t0
+            limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base, timeout=None, limits=limits) as client:
+            results = {}
+            for name, urls in groups.items():
+                results[name] = await run_group(client, urls, args.downloads if name.startswith("download") else args.requests, args.concurrency)
+                results[name]["peak_rss_mb"] = peak_rss_mb(server.pid)
+        return results, load_time, peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(args: argparse.Namespace, results: Dict[str, Dict[str, Any]], load_time: float, rss: float) -> str:
+    lines = [
+        f"data={args.data} mode={args.mode} concurrency={args.concurrency} cache={'off' if args.no_cache else 'on'}",
+        f"startup {load_time * 1000:.0f} ms, peak RSS {rss:.1f} MB",
+        "",
+        f"{'group':<22} {'reqs':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'bytes':>10} {'rss MB':>8}",
+    ]
+    for name, r in results.items():
+        lines.append(
+            f"{name:<22} {r['requests']:>6} {r['rps']:>9.1f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+            f"{r['p99_ms']:>9.2f} {r['avg_bytes']:>10} {r['peak_rss_mb']:>8.1f}"
+            + (f"  ({r['failures']} failed)" if r["failures"] else "")
+        )
+    return "\n".join(lines)
+
+
+def cmd_gen(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    data = json.loads(Path(args.data).read_text(encoding="utf-8")) if args.data else base_dataset(rng)
+    data = scale_dataset(data, args.scale)
+    Path(args.out).write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    print(f"wrote {args.out}")
+
+
+def cmd_run(args: argparse.Namespace) -> None:
+    if httpx is None:
+        raise SystemExit("bench.py run requires httpx (pip install httpx)")
+    data = Path(args.data).resolve()
+    # The app reads these at import time (in-process) or from the
+    # environment it is started with (uvicorn).
+    os.environ["DATA_PATH"] = str(data)
+    snapshot = Path(args.snapshot) if args.snapshot else data.with_name(data.name + ".no-snapshot")
+    os.environ["SNAPSHOT_PATH"] = str(snapshot.resolve())
+    if args.no_cache:
+        os.environ["RESPONSE_CACHE_MAX_BYTES"] = "0"
+        os.environ["EXPORT_CACHE_MAX_BYTES"] = "0"
+
+    rng = random.Random(args.seed)
+    groups = workload(sample_paths(data, rng, args.sample), rng, args.downloads)
+    if args.only:
+        groups = {name: urls for name, urls in groups.items() if any(o in name for o in args.only)}
+    runner = run_uvicorn if args.mode == "uvicorn" else run_inprocess
+    results, load_time, rss = asyncio.run(runner(args, groups))
+
+    text = report(args, results, load_time, rss)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    if args.json:
+        Path(args.json).write_text(json.dumps({"startup_s": load_time, "peak_rss_mb": rss, "groups": results}, indent=2), encoding="utf-8")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Tanzania Locations API benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("gen", help="Write a synthetic dataset.")
+    gen.add_argument("--data", help="Dataset to scale up (default: a generated one of roughly real size).")
+    gen.add_argument("--scale", type=int, default=10, help="Copies of every region's districts (default 10).")
+    gen.add_argument("--seed", type=int, default=1)
+    gen.add_argument("--out", required=True)
+
+    run = sub.add_parser("run", help="Benchmark every endpoint group.")
+    run.add_argument("--data", required=True, help="Dataset JSON to serve.")
+    run.add_argument("--snapshot", help="Serve from this snapshot instead of parsing the JSON.")
+    run.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    run.add_argument("--port", type=int, default=8765)
+    run.add_argument("--requests", type=int, default=500, help="Requests per group (default 500).")
+    run.add_argument("--downloads", type=int, default=3, help="Requests per download group; 0 skips them.")
+    run.add_argument("--concurrency", type=int, default=8)
+    run.add_argument("--sample", type=int, default=2000, help="Distinct paths to draw URLs from.")
+    run.add_argument("--no-cache", action="store_true", help="Disable the response and export caches.")
+    run.add_argument("--only", nargs="*", help="Run only groups whose name contains one of these.")
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument("--out", help="Also write the report here (e.g. bench_output.txt).")
+    run.add_argument("--json", help="Also write the results as JSON here.")
+
+    args = parser.parse_args(argv)
+    if args.command == "gen":
+        cmd_gen(args)
+    else:
+        cmd_run(args)
+
+
+if __name__ == "__main__":
+    main()
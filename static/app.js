@@ -14,6 +14,7 @@ const levelSelect = $("levelSelect");
 const searchBtn = $("searchBtn");
 const clearSearchBtn = $("clearSearchBtn");
 const resultsBox = $("resultsBox");
+const suggestions = $("suggestions");
 
 const healthDot = $("healthDot");
 const healthText = $("healthText");
@@ -155,6 +156,34 @@ function renderSearchResults(items) {
   });
 }
 
+let suggestTimer = null;
+let suggestSeq = 0;
+
+function suggest() {
+  clearTimeout(suggestTimer);
+  const q = searchInput.value.trim();
+  if (!q) {
+    suggestions.innerHTML = "";
+    return;
+  }
+
+  suggestTimer = setTimeout(async () => {
+    const seq = ++suggestSeq;
+    try {
+      const level = levelSelect.value;
+      const res = await apiGet(`/autocomplete?q=${encodeURIComponent(q)}&level=${encodeURIComponent(level)}&limit=5`);
+      if (seq !== suggestSeq) return;  // a newer keystroke already answered
+      const names = new Set();
+      for (const hits of [res.region, res.district, res.ward, res.street]) {
+        for (const h of hits || []) names.add(h.name);
+      }
+      suggestions.innerHTML = [...names].map(n => `<option value="${esc(n)}"></option>`).join("");
+    } catch {
+      suggestions.innerHTML = "";
+    }
+  }, 80);
+}
+
 async function doSearch() {
   const q = searchInput.value.trim();
   if (q.length < 2) {
@@ -165,7 +194,10 @@ async function doSearch() {
   resultsBox.innerHTML = `<div class="muted small">Searching…</div>`;
   try {
     const level = levelSelect.value;
-    const items = await apiGet(`/search?q=${encodeURIComponent(q)}&level=${encodeURIComponent(level)}&limit=80`);
+    const base = `/search?q=${encodeURIComponent(q)}&level=${encodeURIComponent(level)}&limit=80`;
+    let items = await apiGet(base);
+    // Nothing matched exactly: fall back to typo-tolerant matching once.
+    if (!items.length) items = await apiGet(`${base}&fuzzy=true`);
     renderSearchResults(items);
   } catch (e) {
     resultsBox.innerHTML = `<div class="muted small">Error: ${esc(e.message)}</div>`;
@@ -265,9 +297,11 @@ async function init() {
   searchInput.addEventListener("keydown", (e) => {
     if (e.key === "Enter") doSearch();
   });
+  searchInput.addEventListener("input", suggest);
 
   clearSearchBtn.addEventListener("click", () => {
     searchInput.value = "";
+    suggestions.innerHTML = "";
     resultsBox.innerHTML = "";
   });
 }
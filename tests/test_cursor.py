@@ -0,0 +1,54 @@
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+import app
+
+
+def token(**fields) -> str:
+    return base64.urlsafe_b64encode(app.json_fragment(fields)).decode("ascii").rstrip("=")
+
+
+def build_store():
+    wards = lambda names: [{"NAME": n, "STREETS": []} for n in names]
+    return app.build_indexes(
+        {
+            "regions": [
+                {"REGION": "Arusha", "DISTRIC": [{"NAME": "Arumeru", "WARD": wards(["Akheri", "Bangata", "Kikwe"])}]},
+                {"REGION": "Tanga", "DISTRIC": [{"NAME": "Pangani", "WARD": wards(["Bweni", "Madanga", "Mwera", "Tungamaa"])}]},
+            ]
+        },
+        source="a" * 64,
+    )
+
+
+def test_cursor_round_trip():
+    store = build_store()
+    ids = store.children(app.DISTRICT, 1)
+    cursor = app.encode_cursor(store, app.WARD, ids, ids.start + 2)
+    assert app.decode_cursor(store, app.WARD, ids, cursor) == ids.start + 2
+    store.source = "b" * 64  # reloaded: found again by key
+    assert app.decode_cursor(store, app.WARD, ids, cursor) == ids.start + 2
+
+
+def test_cursor_out_of_range_is_rejected():
+    store = build_store()
+    first, second = store.children(app.DISTRICT, 0), store.children(app.DISTRICT, 1)
+    bad = [
+        token(v=store.source[:16], k="akheri", n=-100000, i=1),
+        token(v="0" * 16, k="akheri", n=-100000, i=1),
+        # hint into another district's wards
+        app.encode_cursor(store, app.WARD, second, second.start + 1),
+        token(v=store.source[:16], k="akheri", n=0, i=10**9),
+    ]
+    for cursor in bad:
+        with pytest.raises(HTTPException) as e:
+            app.decode_cursor(store, app.WARD, first, cursor)
+        assert e.value.status_code == 400
+
+    # From another version, a key past the range ends the listing rather
+    # than reading other parents' children.
+    for n in (0, 10**9):
+        cursor = token(v="0" * 16, k="zzz", n=n, i=0)
+        assert app.decode_cursor(store, app.WARD, first, cursor) == first.stop
@@ -0,0 +1,26 @@
+import app
+
+
+def dataset(streets):
+    return {"regions": [{"REGION": "Arusha", "DISTRIC": [{"NAME": "Arumeru", "WARD": [{"NAME": "Akheri", "STREETS": streets}]}]}]}
+
+
+def events(old, new):
+    a = app.build_indexes(dataset(old), source="a" * 64)
+    b = app.build_indexes(dataset(new), source="b" * 64)
+    return [(e["op"], e["path"]) for e in app.diff_stores(a, b) if e["op"] != "delta"]
+
+
+def test_rename_keeps_places():
+    old = [{"NAME": "Kati", "PLACES": ["Soko", "Shule"]}, {"NAME": "Juu", "PLACES": []}]
+    new = [{"NAME": "Katikati", "PLACES": ["Shule", "Soko"]}, {"NAME": "Juu", "PLACES": []}]
+    assert events(old, new) == [("renamed", "Arusha / Arumeru / Akheri / Katikati")]
+
+
+def test_empty_nodes_are_not_renames():
+    old = [{"NAME": "Emptyone", "PLACES": []}, {"NAME": "Kati", "PLACES": ["Soko"]}]
+    new = [{"NAME": "Totallydifferent", "PLACES": []}, {"NAME": "Kati", "PLACES": ["Soko"]}]
+    assert sorted(events(old, new)) == [
+        ("added", "Arusha / Arumeru / Akheri / Totallydifferent"),
+        ("removed", "Arusha / Arumeru / Akheri / Emptyone"),
+    ]
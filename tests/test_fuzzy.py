@@ -0,0 +1,85 @@
+import random
+
+import app
+
+
+def sellers_distance(q: str, text: str) -> int:
+    """
+    The dynamic-programming form substring_distance() replaced.
+    """
+    prev = list(range(len(q) + 1))
+    best = prev[-1]
+    for c in text:
+        cur = [0]
+        for i, qc in enumerate(q, 1):
+            cur.append(min(prev[i] + 1, cur[i - 1] + 1, prev[i - 1] + (qc != c)))
+        best = min(best, cur[-1])
+        prev = cur
+    return best
+
+
+def test_substring_distance_matches_dp():
+    rng = random.Random(3)
+    for _ in range(20000):
+        q = "".join(rng.choice("abcd") for _ in range(rng.randint(1, 12)))
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 20)))
+        assert app.substring_distance(q, text) == sellers_distance(q, text), (q, text)
+
+
+def test_suggestions_in_large_sibling_range():
+    # More wards than RESOLVE_SCAN in one district, and more near-matches
+    # elsewhere in the country than FUZZY_MAX_CANDIDATES.
+    filler = [{"NAME": f"Mtaa {n}", "STREETS": []} for n in range(app.RESOLVE_SCAN + 10)]
+    decoys = [{"NAME": f"Kinondoni {n}", "STREETS": []} for n in range(app.FUZZY_MAX_CANDIDATES + 50)]
+    data = {
+        "regions": [
+            {"REGION": "Alpha", "DISTRIC": [{"NAME": "Decoys", "WARD": decoys}]},
+            {"REGION": "Beta", "DISTRIC": [{"NAME": "Big", "WARD": filler + [{"NAME": "Kinondoni", "STREETS": []}]}]},
+        ]
+    }
+    store = app.build_indexes(data)
+    resolver = app.Resolver(store)
+    out = resolver.resolve(app.AddressIn(region="Beta", district="Big", ward="Kinondon"))
+    assert out.ward is not None and not out.ward.matched
+    assert out.ward.suggestions[:1] == ["Kinondoni"]
+
+
+SYLLABLES = ("ki", "no", "ndo", "ni", "ma", "la", "pa", "bu", "gu", "ru", "ta", "mbe", "ka", "sa", "lam", "ngo", "zi", "wa", "mi", "chi")
+
+
+def typo(rng: random.Random, s: str) -> str:
+    i = rng.randrange(len(s))
+    c = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return rng.choice((s[:i] + c + s[i + 1 :], s[:i] + c + s[i:], s[:i] + s[i + 1 :]))
+
+
+def test_fuzzy_search_recall_matches_brute_force():
+    rng = random.Random(5)
+
+    def name() -> str:
+        return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+    streets = [{"NAME": name(), "PLACES": []} for _ in range(8000)]
+    wards = [{"NAME": f"Ward {n}", "STREETS": streets[n::40]} for n in range(40)]
+    data = {
+        "regions": [
+            {"REGION": "Tanga", "DISTRIC": [{"NAME": "Moshi", "WARD": wards}]},
+            {"REGION": "Arusha", "DISTRIC": [{"NAME": "Karatu", "WARD": []}]},
+        ]
+    }
+    store = app.build_indexes(data)
+    assert [store.name(lvl, i) for lvl, i, _ in app.find_hits(store, "Tamga", "region", 5, True)] == ["Tanga"]
+    assert [store.name(lvl, i) for lvl, i, _ in app.find_hits(store, "Moahi", "district", 5, True)] == ["Moshi"]
+
+    folds = [store.strings[f] for f in store.levels[app.STREET].fold]
+    checked = 0
+    while checked < 60:
+        q = typo(rng, store.name(app.STREET, rng.randrange(len(folds))))
+        fq = app.fold(q)
+        if len(fq) < 3:
+            continue
+        k = app.max_edits(len(fq))
+        scores = [app.fuzzy_score(fq, f, d) for f in folds for d in [app.substring_distance(fq, f)] if d <= k]
+        hits = app.find_hits(store, q, "street", 10, True)
+        assert hits and hits[0][2] == max(scores), q
+        checked += 1